@@ -1,42 +1,122 @@
 import json
+import math
 import os
-import shutil
-from typing import List, Dict
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
 
-from flask import Flask, render_template, request, redirect, url_for, flash, send_from_directory, abort
+import click
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, send_from_directory, abort, jsonify, make_response, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import joinedload, selectinload
 
+from cache import create_cache, create_user_cache
 from config import Config, ensure_directories
-from database import db
-from models import User, Lesson, Announcement, Quiz, QuizQuestion, QuizSubmission, QuizAnswer
+from database import commit_with_retry, configure_sqlite, db, insert_returning_id
+from exports import iter_csv, iter_jsonl
+from grading import dump_correct_answers, join_answer_input, parse_correct_answers, split_answer_input
+from jobs import JobRunner, job_payload
+from metrics import Metrics
+from migrations import current_version, upgrade as upgrade_schema
+from models import User, Lesson, Announcement, Quiz, QuizQuestion, QuizSubmission, QuizAnswer, Job
 from notifications import Notifier
+from outbox import OutboxWorker, enqueue_parent_notification
+from pubsub import create_broker, format_event
+from quiz_cache import QuizCache
+from ratelimit import create_rate_limiter
+from search import SearchIndex
+from stats import (
+    init_quiz_stats,
+    load_question_stats,
+    load_quiz_stats,
+    rebuild_stats,
+    record_grade,
+    record_submission,
+)
+from storage import BlobStore, parse_key
+from user_cache import load_cached_user
 from utils import role_required
 
 
-def create_app() -> Flask:
+def create_app(overrides: Optional[Dict] = None) -> Flask:
     app = Flask(__name__)
     app.config.from_object(Config)
+    if overrides:
+        app.config.update(overrides)
 
-    ensure_directories(app.config)
-
+    # No schema or filesystem work here: importing the app (every server
+    # worker does) stays cheap. Run `flask init` once per deployment instead.
     db.init_app(app)
+    configure_sqlite(app)
 
     login_manager = LoginManager(app)
     login_manager.login_view = "login"
 
     notifier = Notifier(app.config)
-
-    # Jinja filter to load JSON strings
-    @app.template_filter("loads")
-    def jinja_loads_filter(value):
-        try:
-            return json.loads(value) if value else []
-        except Exception:
-            return []
+    metrics = None
+    if app.config["METRICS_ENABLED"]:
+        metrics = Metrics(
+            app.config["SLOW_REQUEST_MS"], app.config["METRICS_MULTIPROC_DIR"], app.config["METRICS_FLUSH_SECONDS"]
+        )
+        metrics.init_app(app)
+        metrics.instrument_notifier(notifier)
+        app.extensions["metrics"] = metrics
+    blob_store = BlobStore(app.config["UPLOAD_FOLDER"], app.config["UPLOAD_CHUNK_SIZE"])
+    app.extensions["blob_store"] = blob_store
+    cache = create_cache(app.config)
+    app.extensions["cache"] = cache
+    user_cache = create_user_cache(app.config)
+    app.extensions["user_cache"] = user_cache
+    quiz_cache = QuizCache(app.config["QUIZ_CACHE_SIZE"])
+    app.extensions["quiz_cache"] = quiz_cache
+    rate_limiter = create_rate_limiter(app.config)
+    app.extensions["rate_limiter"] = rate_limiter
+    broker = create_broker(app.config)
+    app.extensions["broker"] = broker
+    search_index = SearchIndex(app.config["SEARCH_PAGE_SIZE"])
+    app.extensions["search_index"] = search_index
+    outbox_worker = OutboxWorker.from_config(app, notifier)
+    app.extensions["notifier"] = notifier
+    app.extensions["outbox_worker"] = outbox_worker
+    job_runner = JobRunner.from_config(app)
+    app.extensions["job_runner"] = job_runner
+
+    def clear_local_caches(job_id, status):
+        # Only this process is cleared here. In other workers, list and user entries
+        # expire after CACHE_TTL/USER_CACHE_TTL, and the quiz cache revalidates every
+        # lookup against (version, created_at), so it never serves pre-reset quizzes.
+        cache.clear()
+        user_cache.clear()
+        quiz_cache.clear()
+
+    job_runner.on_finished("reset", clear_local_caches)
+
+    # Lists shown identically to every student, cached as plain dicts so any
+    # cache backend can hold them. Invalidated by the handlers that change them.
+    def cached_announcements():
+        return cache.get_or_set("announcements:list", lambda: [
+            {"id": a.id, "title": a.title, "content": a.content}
+            for a in Announcement.query.order_by(Announcement.created_at.desc())
+        ])
+
+    def cached_lessons():
+        return cache.get_or_set("lessons:list", lambda: [
+            {"id": l.id, "title": l.title, "description": l.description, "file_path": l.file_path}
+            for l in Lesson.query.order_by(Lesson.created_at.desc())
+        ])
+
+    def cached_active_quizzes():
+        return cache.get_or_set("quizzes:active", lambda: [
+            {"id": q.id, "title": q.title}
+            for q in Quiz.query.filter_by(is_active=True).order_by(Quiz.created_at.desc())
+        ])
 
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, int(user_id))
+        # A cached snapshot, not the ORM row: most requests need no user query at all
+        return load_cached_user(user_cache, int(user_id), app.config["USER_CACHE_TTL"])
 
     @app.context_processor
     def inject_globals():
@@ -45,6 +125,19 @@ def create_app() -> Flask:
     @app.route("/uploads/<path:filename>")
     @login_required
     def uploaded_file(filename):
+        blob = parse_key(filename)
+        if blob:
+            digest, download_name = blob
+            if not os.path.isfile(blob_store.path_for(digest)):
+                abort(404)
+            return blob_store.send(
+                digest,
+                download_name,
+                mode=app.config["UPLOAD_SERVE_MODE"],
+                accel_prefix=app.config["UPLOAD_ACCEL_PREFIX"],
+                max_age=app.config["UPLOAD_CACHE_MAX_AGE"],
+            )
+        # Files uploaded before content-addressed storage
         return send_from_directory(app.config["UPLOAD_FOLDER"], filename, as_attachment=True)
 
     @app.route("/")
@@ -75,7 +168,7 @@ def create_app() -> Flask:
             if role == "student":
                 user.parent_email = parent_email
                 user.parent_whatsapp = parent_whatsapp
-            user.set_password(password)
+            user.set_password(password, app.config["PASSWORD_HASH_METHOD"])
             db.session.add(user)
             db.session.commit()
             flash("Registration successful. Please log in.", "success")
@@ -87,10 +180,24 @@ def create_app() -> Flask:
         if request.method == "POST":
             email = request.form.get("email", "").strip().lower()
             password = request.form.get("password", "")
+            # Throttled before the (deliberately slow) password hash is checked
+            retry_after = max(
+                rate_limiter.hit("login-ip", request.remote_addr or "unknown"),
+                rate_limiter.hit("login-account", email),
+            )
+            if retry_after:
+                flash("Too many login attempts. Please wait a moment and try again.", "error")
+                response = make_response(render_template("login.html"), 429)
+                response.headers["Retry-After"] = str(math.ceil(retry_after))
+                return response
             user = User.query.filter_by(email=email).first()
             if not user or not user.check_password(password):
                 flash("Invalid credentials.", "error")
                 return render_template("login.html")
+            method = app.config["PASSWORD_HASH_METHOD"]
+            if user.needs_rehash(method):
+                user.set_password(password, method)
+                db.session.commit()
             login_user(user)
             return redirect(url_for("dashboard"))
         return render_template("login.html")
@@ -106,11 +213,12 @@ def create_app() -> Flask:
     def dashboard():
         if current_user.role == "teacher":
             quizzes = Quiz.query.filter_by(created_by_id=current_user.id).order_by(Quiz.created_at.desc()).all()
-            return render_template("teacher_dashboard.html", quizzes=quizzes)
+            quiz_stats = load_quiz_stats([q.id for q in quizzes])
+            return render_template("teacher_dashboard.html", quizzes=quizzes, quiz_stats=quiz_stats)
         else:
-            announcements = Announcement.query.order_by(Announcement.created_at.desc()).all()
-            quizzes = Quiz.query.filter_by(is_active=True).order_by(Quiz.created_at.desc()).all()
-            lessons = Lesson.query.order_by(Lesson.created_at.desc()).all()
+            announcements = cached_announcements()
+            quizzes = cached_active_quizzes()
+            lessons = cached_lessons()
             return render_template("student_dashboard.html", announcements=announcements, quizzes=quizzes, lessons=lessons)
 
     # Lessons
@@ -125,20 +233,30 @@ def create_app() -> Flask:
             uploaded = request.files.get("file")
             file_path = None
             if uploaded and uploaded.filename:
-                filename = uploaded.filename
-                safe_name = filename
-                file_dir = app.config["UPLOAD_FOLDER"]
-                os.makedirs(file_dir, exist_ok=True)
-                destination = os.path.join(file_dir, safe_name)
-                uploaded.save(destination)
-                file_path = safe_name
-            lesson = Lesson(title=title, description=description, file_path=file_path, created_by=current_user)
+                file_path = blob_store.save(uploaded)
+            lesson = Lesson(title=title, description=description, file_path=file_path, created_by_id=current_user.id)
             db.session.add(lesson)
+            db.session.flush()
+            search_index.add("lesson", [{"ref_id": lesson.id, "title": title, "body": description}])
             db.session.commit()
+            cache.delete("lessons:list")
             flash("Lesson uploaded.", "success")
             return redirect(url_for("lessons_page"))
-        all_lessons = Lesson.query.order_by(Lesson.created_at.desc()).all()
-        return render_template("lessons.html", lessons=all_lessons)
+        return render_template("lessons.html", lessons=cached_lessons())
+
+    @app.route("/lessons/<int:lesson_id>/delete", methods=["POST"])
+    @login_required
+    @role_required("teacher")
+    def lesson_delete(lesson_id: int):
+        lesson = Lesson.query.get_or_404(lesson_id)
+        unreferenced = blob_store.release(lesson.file_path)
+        search_index.remove("lesson", [lesson.id])
+        db.session.delete(lesson)
+        db.session.commit()
+        cache.delete("lessons:list")
+        blob_store.remove_unreferenced([unreferenced])
+        flash("Lesson deleted.", "success")
+        return redirect(url_for("lessons_page"))
 
     # Announcements
     @app.route("/announcements", methods=["GET", "POST"])
@@ -149,13 +267,25 @@ def create_app() -> Flask:
                 abort(403)
             title = request.form.get("title", "").strip()
             content = request.form.get("content", "").strip()
-            ann = Announcement(title=title, content=content, created_by=current_user)
+            ann = Announcement(title=title, content=content, created_by_id=current_user.id)
             db.session.add(ann)
+            db.session.flush()
+            search_index.add("announcement", [{"ref_id": ann.id, "title": title, "body": content}])
             db.session.commit()
+            cache.delete("announcements:list")
+            broker.publish("announcement", {"id": ann.id, "title": ann.title, "content": ann.content})
             flash("Announcement posted.", "success")
             return redirect(url_for("announcements_page"))
-        all_ann = Announcement.query.order_by(Announcement.created_at.desc()).all()
-        return render_template("announcements.html", announcements=all_ann)
+        return render_template("announcements.html", announcements=cached_announcements())
+
+    @app.route("/search")
+    @login_required
+    def search():
+        # Students only see questions of active quizzes, like on their dashboard
+        query = request.args.get("q", "").strip()
+        page = max(request.args.get("page", 1, type=int), 1)
+        results, has_next = search_index.search(query, page, include_inactive=current_user.role == "teacher")
+        return render_template("search.html", query=query, results=results, page=page, has_next=has_next)
 
     # Quizzes
     @app.route("/quiz/create", methods=["GET", "POST"])
@@ -165,11 +295,9 @@ def create_app() -> Flask:
         if request.method == "POST":
             title = request.form.get("title", "").strip()
             description = request.form.get("description", "").strip()
-            quiz = Quiz(title=title, description=description, created_by=current_user)
-            db.session.add(quiz)
-            db.session.flush()
 
             # Parse dynamic questions
+            questions = []
             total_questions = int(request.form.get("total_questions", 0))
             for i in range(1, total_questions + 1):
                 q_text = request.form.get(f"q{i}_text", "").strip()
@@ -180,17 +308,28 @@ def create_app() -> Flask:
                 if q_type == "mcq":
                     options = [o for o in request.form.getlist(f"q{i}_options") if o.strip()]
                     options_json = json.dumps(options)
-                    correct_answer = request.form.get(f"q{i}_correct", "").strip()
-                question = QuizQuestion(
-                    quiz=quiz,
-                    question_text=q_text,
-                    question_type=q_type,
-                    options_json=options_json,
-                    correct_answer=correct_answer,
-                    points=points,
-                )
-                db.session.add(question)
+                    correct_answer = dump_correct_answers(split_answer_input(request.form.get(f"q{i}_correct", "")))
+                questions.append({
+                    "question_text": q_text,
+                    "question_type": q_type,
+                    "options_json": options_json,
+                    "correct_answer": correct_answer,
+                    "points": points,
+                })
+
+            # Quiz, questions and stats rows in a constant number of statements
+            quiz_id = insert_returning_id(Quiz, {"title": title, "description": description, "created_by_id": current_user.id})
+            if questions:
+                db.session.execute(insert(QuizQuestion), [dict(question, quiz_id=quiz_id) for question in questions])
+                search_index.add_quiz(quiz_id)
+            init_quiz_stats(quiz_id)
             db.session.commit()
+            cache.delete("quizzes:active")
+            # New quizzes start active (models.Quiz.is_active default)
+            broker.publish("quiz", {
+                "id": quiz_id, "title": title, "is_active": True,
+                "url": url_for("quiz_take", quiz_id=quiz_id),
+            })
             flash("Quiz created.", "success")
             return redirect(url_for("dashboard"))
         return render_template("quiz_create.html")
@@ -199,20 +338,34 @@ def create_app() -> Flask:
     @login_required
     @role_required("teacher")
     def quiz_manage():
-        quizzes = Quiz.query.filter_by(created_by_id=current_user.id).order_by(Quiz.created_at.desc()).all()
-        return render_template("quiz_manage.html", quizzes=quizzes)
+        quizzes = (
+            Quiz.query.filter_by(created_by_id=current_user.id)
+            .options(selectinload(Quiz.questions))
+            .order_by(Quiz.created_at.desc())
+            .all()
+        )
+        quiz_ids = [q.id for q in quizzes]
+        return render_template(
+            "quiz_manage.html",
+            quizzes=quizzes,
+            quiz_stats=load_quiz_stats(quiz_ids),
+            question_stats=load_question_stats(quiz_ids),
+        )
 
     @app.route("/quiz/<int:quiz_id>", methods=["GET", "POST"])
     @login_required
     def quiz_take(quiz_id: int):
-        quiz = Quiz.query.get_or_404(quiz_id)
+        # Served from the compiled quiz: no relationship loads or JSON decoding per request
+        quiz = quiz_cache.get(quiz_id)
+        if quiz is None:
+            abort(404)
         if request.method == "POST":
-            submission = QuizSubmission(quiz=quiz, student=current_user)
-            db.session.add(submission)
-            db.session.flush()
-
+            # Grade and store uploads first so the write transaction below stays short
+            answers = []
+            uploads = []
             total_score = 0
             fully_graded = True
+            mcq_results = []
 
             for question in quiz.questions:
                 field_name = f"q_{question.id}"
@@ -225,46 +378,62 @@ def create_app() -> Flask:
                 if question.question_type == "file":
                     uploaded = request.files.get(file_field)
                     if uploaded and uploaded.filename:
-                        safe_name = f"answer_{submission.id}_{question.id}_{uploaded.filename}"
-                        destination = os.path.join(app.config["UPLOAD_FOLDER"], safe_name)
-                        uploaded.save(destination)
-                        file_path = safe_name
+                        digest, size, file_path = blob_store.write(uploaded)
+                        uploads.append((digest, size))
                         fully_graded = False
                 else:
                     answer_text = request.form.get(field_name, "")
                     if question.question_type == "mcq":
-                        is_correct = (answer_text.strip() == (question.correct_answer or "").strip())
-                        score = question.points if is_correct else 0
+                        is_correct, score = quiz.answer_key.grade(question.id, answer_text)
                         total_score += score
+                        mcq_results.append((question.id, is_correct))
                     else:
                         # text: needs manual grading
                         fully_graded = False
 
-                ans = QuizAnswer(
-                    submission=submission,
-                    question=question,
-                    answer_text=answer_text,
-                    file_path=file_path,
-                    is_correct=is_correct,
-                    score=score,
-                )
-                db.session.add(ans)
-
-            submission.total_score = total_score if fully_graded else None
-            submission.graded = fully_graded
+                answers.append({
+                    "question_id": question.id,
+                    "answer_text": answer_text,
+                    "file_path": file_path,
+                    "is_correct": is_correct,
+                    "score": score,
+                })
+
+            graded = fully_graded
+            final_score = total_score if fully_graded else None
+            student_id = current_user.id
+            notify = current_user.role == "student" and app.config.get("AUTO_NOTIFY_PARENTS", True)
+            parent_email, parent_whatsapp = current_user.parent_email, current_user.parent_whatsapp
+            summary = f"Student {current_user.name} submitted quiz '{quiz.title}'."
+            if graded:
+                summary += f" Score: {final_score}."
+            else:
+                summary += " Grading pending for some answers."
+            # End the read transaction so the write starts fresh and waits on busy_timeout
             db.session.commit()
 
-            # Notify parents if student and config enabled
-            if current_user.role == "student" and app.config.get("AUTO_NOTIFY_PARENTS", True):
-                summary = f"Student {current_user.name} submitted quiz '{quiz.title}'."
-                if submission.graded:
-                    summary += f" Score: {submission.total_score}."
-                else:
-                    summary += " Grading pending for some answers."
-                if current_user.parent_email:
-                    notifier.send_email(current_user.parent_email, "Quiz submission update", summary)
-                if current_user.parent_whatsapp:
-                    notifier.send_whatsapp(current_user.parent_whatsapp, summary)
+            def write_submission():
+                # One INSERT for the submission, one batched INSERT for all answers
+                submission_id = insert_returning_id(QuizSubmission, {
+                    "quiz_id": quiz_id,
+                    "student_id": student_id,
+                    "total_score": final_score,
+                    "graded": graded,
+                })
+                for digest, size in uploads:
+                    blob_store.add_reference(digest, size)
+                if answers:
+                    db.session.execute(insert(QuizAnswer), [dict(answer, submission_id=submission_id) for answer in answers])
+                record_submission(quiz_id, graded, final_score, mcq_results)
+                # Notify parents if student and config enabled (queued in the same transaction)
+                if notify:
+                    enqueue_parent_notification(notifier, parent_email, parent_whatsapp, "Quiz submission update", summary)
+
+            commit_with_retry(
+                write_submission,
+                attempts=app.config["DB_WRITE_RETRY_ATTEMPTS"],
+                backoff_seconds=app.config["DB_WRITE_RETRY_BACKOFF"],
+            )
 
             flash("Submission received.", "success")
             return redirect(url_for("dashboard"))
@@ -275,21 +444,85 @@ def create_app() -> Flask:
     @login_required
     def quiz_results(quiz_id: int):
         quiz = Quiz.query.get_or_404(quiz_id)
+        # Student, answers and questions are loaded up front so rendering issues no further queries
+        eager = (
+            joinedload(QuizSubmission.student),
+            selectinload(QuizSubmission.answers).joinedload(QuizAnswer.question),
+        )
         if current_user.role == "teacher":
-            submissions = QuizSubmission.query.filter_by(quiz_id=quiz.id).order_by(QuizSubmission.submitted_at.desc()).all()
-            return render_template("quiz_results.html", quiz=quiz, submissions=submissions)
+            pending_only = request.args.get("pending") == "1"
+            query = QuizSubmission.query.filter_by(quiz_id=quiz.id).options(*eager)
+            if pending_only:
+                query = query.filter(QuizSubmission.graded.isnot(True))
+
+            # Keyset pagination on (submitted_at, id), newest first
+            before_at = request.args.get("before_at")
+            before_id = request.args.get("before_id", type=int)
+            if before_at and before_id is not None:
+                try:
+                    before_at = datetime.fromisoformat(before_at)
+                except ValueError:
+                    abort(400)
+                query = query.filter(
+                    or_(
+                        QuizSubmission.submitted_at < before_at,
+                        and_(QuizSubmission.submitted_at == before_at, QuizSubmission.id < before_id),
+                    )
+                )
+            page_size = app.config["RESULTS_PAGE_SIZE"]
+            submissions = (
+                query.order_by(QuizSubmission.submitted_at.desc(), QuizSubmission.id.desc())
+                .limit(page_size + 1)
+                .all()
+            )
+            next_page = None
+            if len(submissions) > page_size:
+                submissions = submissions[:page_size]
+                last = submissions[-1]
+                next_page = {"before_at": last.submitted_at.isoformat(), "before_id": last.id}
+            return render_template(
+                "quiz_results.html",
+                quiz=quiz,
+                submissions=submissions,
+                pending_only=pending_only,
+                next_page=next_page,
+            )
         else:
-            submission = QuizSubmission.query.filter_by(quiz_id=quiz.id, student_id=current_user.id).order_by(QuizSubmission.submitted_at.desc()).first()
+            submission = (
+                QuizSubmission.query.filter_by(quiz_id=quiz.id, student_id=current_user.id)
+                .options(*eager)
+                .order_by(QuizSubmission.submitted_at.desc())
+                .first()
+            )
             if not submission:
                 flash("No submissions yet.", "info")
                 return redirect(url_for("dashboard"))
             return render_template("quiz_results.html", quiz=quiz, submissions=[submission])
 
+    @app.route("/quiz/<int:quiz_id>/export.<fmt>")
+    @login_required
+    @role_required("teacher")
+    def quiz_export(quiz_id: int, fmt: str):
+        quiz = Quiz.query.get_or_404(quiz_id)
+        if fmt == "csv":
+            rows, mimetype = iter_csv(quiz.id, app.config["EXPORT_BATCH_SIZE"]), "text/csv"
+        elif fmt == "jsonl":
+            rows, mimetype = iter_jsonl(quiz.id, app.config["EXPORT_BATCH_SIZE"]), "application/x-ndjson"
+        else:
+            abort(404)
+        # Streamed straight from the DB cursor; the file is never built in memory
+        return Response(
+            stream_with_context(rows),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename=quiz_{quiz.id}_submissions.{fmt}"},
+        )
+
     @app.route("/quiz/<int:submission_id>/grade", methods=["POST"]) 
     @login_required
     @role_required("teacher")
     def quiz_grade_submission(submission_id: int):
         submission = QuizSubmission.query.get_or_404(submission_id)
+        was_graded, old_total = bool(submission.graded), submission.total_score
         total = 0
         for ans in submission.answers:
             if ans.question.question_type in ("text", "file"):
@@ -304,20 +537,84 @@ def create_app() -> Flask:
             ans.is_correct = None if ans.question.question_type != "mcq" else ans.is_correct
         submission.total_score = total
         submission.graded = True
-        db.session.commit()
+        record_grade(submission.quiz_id, was_graded, old_total, total)
 
-        # Notify parents with final score
+        # Notify parents with final score (queued in the same transaction)
         student = submission.student
         quiz = submission.quiz
         summary = f"Student {student.name} graded for quiz '{quiz.title}'. Score: {submission.total_score}."
-        if student.parent_email:
-            notifier.send_email(student.parent_email, "Quiz result", summary)
-        if student.parent_whatsapp:
-            notifier.send_whatsapp(student.parent_whatsapp, summary)
+        enqueue_parent_notification(notifier, student.parent_email, student.parent_whatsapp, "Quiz result", summary)
+        db.session.commit()
 
         flash("Submission graded and parents notified.", "success")
         return redirect(url_for("quiz_results", quiz_id=submission.quiz_id))
 
+    @app.route("/quiz/<int:quiz_id>/grade-all", methods=["POST"])
+    @login_required
+    @role_required("teacher")
+    def quiz_grade_all(quiz_id: int):
+        quiz = Quiz.query.get_or_404(quiz_id)
+        requested_ids = [int(v) for v in request.form.getlist("submission_id") if v.isdigit()]
+        if not requested_ids:
+            flash("No pending submissions to grade.", "info")
+            return redirect(url_for("quiz_results", quiz_id=quiz.id))
+        scores = {
+            name[len("score_"):]: value for name, value in request.form.items()
+            if name.startswith("score_") and name[len("score_"):].isdigit()
+        }
+        job_id = job_runner.submit(
+            "grade_all",
+            {"quiz_id": quiz.id, "submission_ids": requested_ids, "scores": scores,
+             "return_to": url_for("quiz_results", quiz_id=quiz.id)},
+            created_by_id=current_user.id,
+        )
+        return redirect(url_for("job_status", job_id=job_id))
+
+    @app.route("/quiz/<int:quiz_id>/answer-key", methods=["GET", "POST"])
+    @login_required
+    @role_required("teacher")
+    def quiz_answer_key(quiz_id: int):
+        quiz = Quiz.query.get_or_404(quiz_id)
+        mcq_questions = [q for q in quiz.questions if q.question_type == "mcq"]
+        if request.method == "POST":
+            changed = False
+            for question in mcq_questions:
+                correct_answer = dump_correct_answers(split_answer_input(request.form.get(f"correct_{question.id}", "")))
+                try:
+                    points = max(1, int(request.form.get(f"points_{question.id}", question.points)))
+                except ValueError:
+                    points = question.points
+                if correct_answer != question.correct_answer or points != question.points:
+                    question.correct_answer = correct_answer
+                    question.points = points
+                    changed = True
+            if changed:
+                quiz.version = (quiz.version or 1) + 1
+            db.session.commit()
+            quiz_cache.invalidate(quiz.id)
+            flash("Answer key saved." if changed else "Answer key unchanged.", "success")
+            if request.form.get("regrade"):
+                job_id = job_runner.submit(
+                    "regrade", {"quiz_id": quiz.id, "return_to": url_for("quiz_manage")}, created_by_id=current_user.id
+                )
+                return redirect(url_for("job_status", job_id=job_id))
+            return redirect(url_for("quiz_manage"))
+        answer_keys = {q.id: join_answer_input(parse_correct_answers(q.correct_answer)) for q in mcq_questions}
+        options = {q.id: q.options for q in quiz_cache.get(quiz.id).questions}
+        return render_template(
+            "quiz_answer_key.html", quiz=quiz, questions=mcq_questions, answer_keys=answer_keys, options=options
+        )
+
+    @app.route("/quiz/<int:quiz_id>/regrade", methods=["POST"])
+    @login_required
+    @role_required("teacher")
+    def quiz_regrade(quiz_id: int):
+        quiz = Quiz.query.get_or_404(quiz_id)
+        job_id = job_runner.submit(
+            "regrade", {"quiz_id": quiz.id, "return_to": url_for("quiz_manage")}, created_by_id=current_user.id
+        )
+        return redirect(url_for("job_status", job_id=job_id))
+
     @app.route("/quiz/<int:quiz_id>/toggle", methods=["POST"]) 
     @login_required
     @role_required("teacher")
@@ -325,37 +622,169 @@ def create_app() -> Flask:
         quiz = Quiz.query.get_or_404(quiz_id)
         quiz.is_active = not quiz.is_active
         db.session.commit()
+        cache.delete("quizzes:active")
+        quiz_cache.invalidate(quiz.id)
+        broker.publish("quiz", {
+            "id": quiz.id, "title": quiz.title, "is_active": quiz.is_active,
+            "url": url_for("quiz_take", quiz_id=quiz.id),
+        })
         return redirect(url_for("quiz_manage"))
 
     @app.route("/reset", methods=["POST"]) 
     @login_required
     @role_required("teacher")
     def reset():
-        # Danger: clears all data and uploads
-        upload_dir = app.config["UPLOAD_FOLDER"]
-        if os.path.isdir(upload_dir):
-            for name in os.listdir(upload_dir):
-                try:
-                    path = os.path.join(upload_dir, name)
-                    if os.path.isfile(path):
-                        os.remove(path)
-                    else:
-                        shutil.rmtree(path, ignore_errors=True)
-                except Exception:
-                    pass
-        # Recreate database
-        db.drop_all()
-        db.create_all()
-        flash("Application data reset.", "success")
-        return redirect(url_for("dashboard"))
+        # Danger: clears all data and uploads (in the background, see jobs.py)
+        job_id = job_runner.submit("reset", {"return_to": url_for("dashboard")}, created_by_id=current_user.id)
+        return redirect(url_for("job_status", job_id=job_id))
+
+    @app.route("/quiz/<int:quiz_id>/export-job.<fmt>", methods=["POST"])
+    @login_required
+    @role_required("teacher")
+    def quiz_export_job(quiz_id: int, fmt: str):
+        quiz = Quiz.query.get_or_404(quiz_id)
+        if fmt not in ("csv", "jsonl"):
+            abort(404)
+        job_id = job_runner.submit(
+            "export",
+            {"quiz_id": quiz.id, "fmt": fmt, "return_to": url_for("quiz_results", quiz_id=quiz.id)},
+            created_by_id=current_user.id,
+        )
+        return redirect(url_for("job_status", job_id=job_id))
+
+    @app.route("/jobs/<int:job_id>")
+    @login_required
+    @role_required("teacher")
+    def job_status(job_id: int):
+        job_runner.reap_orphans()
+        job = db.get_or_404(Job, job_id)
+        return render_template("job_status.html", job=job_payload(job))
 
+    @app.route("/jobs/<int:job_id>.json")
+    @login_required
+    @role_required("teacher")
+    def job_status_json(job_id: int):
+        job_runner.reap_orphans()
+        return jsonify(job_payload(db.get_or_404(Job, job_id)))
+
+    @app.route("/jobs/<int:job_id>/download")
+    @login_required
+    @role_required("teacher")
+    def job_download(job_id: int):
+        payload = job_payload(db.get_or_404(Job, job_id))
+        result = payload["result"] or {}
+        if payload["status"] != "succeeded" or not result.get("file"):
+            abort(404)
+        return send_from_directory(
+            app.config["JOBS_OUTPUT_FOLDER"], result["file"], as_attachment=True, download_name=result["download_name"]
+        )
+
+    @app.route("/cache/stats")
+    @login_required
+    @role_required("teacher")
+    def cache_stats():
+        return jsonify(dict(cache.stats(), users=user_cache.stats()))
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        if metrics is None:
+            abort(404)
+        token = app.config["METRICS_TOKEN"]
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            abort(401)
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+    @app.route("/events")
+    @login_required
+    def events():
+        # Server-sent events for pages that list announcements/active quizzes, so
+        # clients update in place instead of reloading the dashboard
+        subscription = broker.subscribe(request.headers.get("Last-Event-ID", type=int))
+        if subscription is None:
+            # Full: an empty stream with a spread-out retry, so browsers come back later
+            # rather than all at once
+            retry_ms = random.randint(app.config["SSE_RETRY_MS"], 6 * app.config["SSE_RETRY_MS"])
+            return Response(f"retry: {retry_ms}\n\n", mimetype="text/event-stream")
+
+        heartbeat = app.config["SSE_HEARTBEAT_SECONDS"]
+        deadline = time.monotonic() + app.config["SSE_STREAM_SECONDS"]
+
+        def stream():
+            try:
+                yield f"retry: {app.config['SSE_RETRY_MS']}\n\n"
+                while time.monotonic() < deadline and not subscription.closed:
+                    event = subscription.get(timeout=heartbeat)
+                    # The keep-alive comment also surfaces disconnected clients as write errors
+                    yield format_event(event) if event else ": keep-alive\n\n"
+            finally:
+                broker.unsubscribe(subscription)
+
+        response = Response(stream(), mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"  # nginx: pass events through unbuffered
+        return response
+
+    @app.cli.command("outbox-worker")
+    def outbox_worker_command():
+        """Deliver queued parent notifications until interrupted."""
+        outbox_worker.run_forever()
+
+    @app.cli.command("rebuild-stats")
+    @click.option("--quiz-id", type=int, default=None, help="Only rebuild this quiz.")
+    def rebuild_stats_command(quiz_id):
+        """Recompute quiz statistics from submissions and answers."""
+        count = rebuild_stats(quiz_id)
+        click.echo(f"Rebuilt statistics for {count} quiz(zes).")
+
+    @app.cli.command("gc-uploads")
+    def gc_uploads_command():
+        """Delete stored upload blobs that no lesson or answer references."""
+        removed = blob_store.collect_orphans()
+        click.echo(f"Removed {len(removed)} orphaned upload(s).")
+
+    @app.cli.command("db-upgrade")
+    def db_upgrade_command():
+        """Apply pending schema migrations to the configured database."""
+        applied = upgrade_schema(db.engine)
+        click.echo(f"Applied migrations: {applied or 'none'}. Schema version: {current_version(db.engine)}.")
+
+    @app.cli.command("rebuild-search")
+    def rebuild_search_command():
+        """Rebuild the full-text search index from lessons, announcements and questions."""
+        if not search_index.uses_fts():
+            click.echo("No search index (FTS5 unavailable or `flask init` not run); search uses LIKE.")
+            return
+        search_index.rebuild()
+        db.session.commit()
+        click.echo("Search index rebuilt.")
+
+    @app.cli.command("init")
+    def init_command():
+        """Create folders, tables and apply migrations (safe to re-run)."""
+        applied = init_db(app)
+        click.echo(f"Initialized. Applied migrations: {applied or 'none'}. Schema version: {current_version(db.engine)}.")
+
+    return app
+
+
+def init_db(app: Flask) -> List[int]:
+    # One-time setup for a database and upload folder; every step is idempotent
+    ensure_directories(app.config)
     with app.app_context():
         db.create_all()
+        return upgrade_schema(db.engine)
 
-    return app
 
+def start_background_workers(app: Flask) -> None:
+    # Only server processes deliver notifications in-process; create_app alone
+    # starts no threads, so CLI commands and scripts can build the app freely
+    if app.config["OUTBOX_RUN_WORKER"]:
+        app.extensions["outbox_worker"].start()
 
-app = create_app()
 
 if __name__ == "__main__":
+    # Development server. Production: `python serve.py init` once, then `python serve.py serve`
+    app = create_app()
+    init_db(app)
+    start_background_workers(app)
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
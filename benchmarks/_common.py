@@ -0,0 +1,37 @@
+"""Shared setup for the benchmark scripts (not a benchmark itself).
+
+Each script calls scratch_dir() before importing any app module: config reads
+the environment at import time.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def scratch_dir(prefix: str, database: str = "scratch.db") -> str:
+    # Points the database, uploads and job output at a temporary directory that
+    # is removed when the script exits. Spawned child processes re-run the
+    # script's top level; they inherit the directory instead of making their own
+    # and leave the cleanup to the process that created it.
+    workdir = os.environ.get("BENCH_WORKDIR")
+    if not workdir:
+        workdir = tempfile.mkdtemp(prefix=prefix)
+        os.environ["BENCH_WORKDIR"] = workdir
+        owner = os.getpid()
+
+        def cleanup() -> None:
+            if os.getpid() == owner:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        atexit.register(cleanup)
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, database)}"
+    os.environ["UPLOAD_FOLDER"] = os.path.join(workdir, "uploads")
+    os.environ["JOBS_OUTPUT_FOLDER"] = os.path.join(workdir, "job_output")
+    os.environ["OUTBOX_RUN_WORKER"] = "false"
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    return workdir
@@ -0,0 +1,113 @@
+"""Micro-benchmark for the two highest-write paths: creating a quiz with many
+questions and storing a submission with one answer per question. Compares the
+old per-row ORM unit of work with the batched INSERTs used by app.py.
+
+    python benchmarks/bulk_insert.py [--questions 50] [--rounds 200]
+"""
+import argparse
+import time
+
+from _common import scratch_dir
+
+scratch_dir("bench-bulk-", "bench.db")
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from database import db, insert_returning_id  # noqa: E402
+from models import Quiz, QuizAnswer, QuizQuestion, QuizSubmission, User  # noqa: E402
+
+
+def question_rows(count: int):
+    return [
+        {"question_text": f"Question {n}", "question_type": "mcq", "options_json": '["A", "B", "C"]',
+         "correct_answer": '["A"]', "points": 1}
+        for n in range(count)
+    ]
+
+
+def create_quiz_per_row(teacher_id: int, rows) -> int:
+    quiz = Quiz(title="Quiz", created_by_id=teacher_id)
+    db.session.add(quiz)
+    db.session.flush()
+    for row in rows:
+        db.session.add(QuizQuestion(quiz=quiz, **row))
+    db.session.commit()
+    return quiz.id
+
+
+def create_quiz_bulk(teacher_id: int, rows) -> int:
+    quiz_id = insert_returning_id(Quiz, {"title": "Quiz", "created_by_id": teacher_id})
+    db.session.execute(insert(QuizQuestion), [dict(row, quiz_id=quiz_id) for row in rows])
+    db.session.commit()
+    return quiz_id
+
+
+def submit_per_row(quiz_id: int, student_id: int, question_ids) -> None:
+    submission = QuizSubmission(quiz_id=quiz_id, student_id=student_id, graded=True, total_score=len(question_ids))
+    db.session.add(submission)
+    db.session.flush()
+    for question_id in question_ids:
+        db.session.add(QuizAnswer(submission=submission, question_id=question_id, answer_text="A", is_correct=True, score=1))
+    db.session.commit()
+
+
+def submit_bulk(quiz_id: int, student_id: int, question_ids) -> None:
+    submission_id = insert_returning_id(QuizSubmission, {
+        "quiz_id": quiz_id, "student_id": student_id, "graded": True, "total_score": len(question_ids),
+    })
+    db.session.execute(insert(QuizAnswer), [
+        {"submission_id": submission_id, "question_id": question_id, "answer_text": "A", "is_correct": True, "score": 1}
+        for question_id in question_ids
+    ])
+    db.session.commit()
+
+
+def timed(label: str, rounds: int, unit: str, per_round: int, fn) -> None:
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    elapsed = time.perf_counter() - started
+    event.remove(db.engine, "before_cursor_execute", count)
+    print(f"{label:28s} {rounds * per_round / elapsed:10.0f} {unit}/s   "
+          f"{elapsed / rounds * 1000:7.2f} ms/op   {statements[0] / rounds:6.1f} statements/op")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    from app import create_app, init_db
+
+    app = create_app()
+    init_db(app)
+    with app.app_context():
+        teacher = User(name="Teacher", email="t@example.com", role="teacher", password_hash="x")
+        student = User(name="Student", email="s@example.com", role="student", password_hash="x")
+        db.session.add_all([teacher, student])
+        db.session.commit()
+        rows = question_rows(args.questions)
+        quiz_id = create_quiz_bulk(teacher.id, rows)
+        question_ids = [q.id for q in QuizQuestion.query.filter_by(quiz_id=quiz_id)]
+        teacher_id, student_id = teacher.id, student.id
+
+        print(f"{args.questions} questions per quiz, {args.rounds} rounds")
+        timed("quiz create (per-row ORM)", args.rounds, "questions", args.questions,
+              lambda: create_quiz_per_row(teacher_id, rows))
+        timed("quiz create (bulk)", args.rounds, "questions", args.questions,
+              lambda: create_quiz_bulk(teacher_id, rows))
+        timed("submission (per-row ORM)", args.rounds, "submissions", 1,
+              lambda: submit_per_row(quiz_id, student_id, question_ids))
+        timed("submission (bulk)", args.rounds, "submissions", 1,
+              lambda: submit_bulk(quiz_id, student_id, question_ids))
+
+
+if __name__ == "__main__":
+    main()
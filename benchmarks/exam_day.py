@@ -0,0 +1,379 @@
+"""Exam-day load test: seeds teachers, students and mixed mcq/text/file quizzes,
+then drives the app with concurrent student and teacher flows (login,
+dashboard, quiz_take GET/POST, quiz_results, quiz_grade_submission). Reports
+p50/p95/p99 latency, throughput and SQL queries per request per step, and can
+save or compare against a baseline. SMTP and Twilio are stubbed locally.
+
+    python benchmarks/exam_day.py [--workers 8] [--students 2000] [--save-baseline base.json]
+    python benchmarks/exam_day.py --baseline base.json   # exit status 1 on regression
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import socketserver
+import sys
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from _common import scratch_dir
+
+WORKDIR = scratch_dir("bench-examday-")
+
+PASSWORD = "bench-password"
+QUESTION_MIX = ["mcq"] * 6 + ["text"] * 3 + ["file"]
+OPTIONS = ["A", "B", "C", "D"]
+
+
+# --- Local stand-ins for the notification providers -------------------------
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough SMTP for smtplib: greeting, EHLO, AUTH, MAIL/RCPT, DATA, NOOP, QUIT
+    def handle(self):
+        self.wfile.write(b"220 bench\r\n")
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    self.server.messages += 1
+                    self.wfile.write(b"250 queued\r\n")
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.wfile.write(b"250-bench\r\n250 AUTH PLAIN LOGIN\r\n")
+            elif command == b"AUTH":
+                self.wfile.write(b"235 ok\r\n")
+            elif command == b"DATA":
+                in_data = True
+                self.wfile.write(b"354 end with .\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 ok\r\n")
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    messages = 0
+
+
+class StubTwilio:
+    def __init__(self) -> None:
+        self.sent = 0
+        self.messages = self
+
+    def create(self, **kwargs):
+        self.sent += 1
+
+
+def start_smtp_server() -> _SMTPServer:
+    server = _SMTPServer(("127.0.0.1", 0), _SMTPHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# --- App, seeding and flows ----------------------------------------------------
+
+def make_app(db_path: str, smtp_port: int):
+    from app import create_app, init_db
+
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "UPLOAD_FOLDER": os.path.join(WORKDIR, "uploads"),
+        "OUTBOX_RUN_WORKER": False,
+        "RATELIMIT_ENABLED": False,  # every simulated client shares 127.0.0.1
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": smtp_port,
+        "MAIL_USE_TLS": False,
+        "MAIL_USERNAME": "bench",
+        "MAIL_PASSWORD": "bench",
+        "TWILIO_ACCOUNT_SID": "bench",
+        "TWILIO_AUTH_TOKEN": "bench",
+    })
+    init_db(app)
+    return app
+
+
+def seed(app, args) -> List[dict]:
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+
+    from database import db
+    from models import Quiz, QuizAnswer, QuizQuestion, QuizSubmission, User
+    from stats import rebuild_stats
+
+    rng = random.Random(args.seed)
+    # One hash shared by every account keeps seeding fast while logins still pay the real hashing cost
+    password_hash = generate_password_hash(PASSWORD)
+    with app.app_context():
+        users = [
+            {"id": t, "name": f"Teacher {t}", "email": f"teacher{t}@example.com", "password_hash": password_hash,
+             "role": "teacher"}
+            for t in range(1, args.teachers + 1)
+        ]
+        first_student = args.teachers + 1
+        users += [
+            {"id": s, "name": f"Student {s}", "email": f"student{s}@example.com", "password_hash": password_hash,
+             "role": "student", "parent_email": f"parent{s}@example.com", "parent_whatsapp": f"+1555{s:07d}"}
+            for s in range(first_student, first_student + args.students)
+        ]
+        db.session.execute(insert(User), users)
+
+        quizzes, questions = [], []
+        question_id = 0
+        for quiz_id in range(1, args.quizzes + 1):
+            db.session.execute(insert(Quiz), [{
+                "id": quiz_id, "title": f"Exam {quiz_id}", "description": "Exam day",
+                "created_by_id": 1 + (quiz_id - 1) % args.teachers, "is_active": True,
+            }])
+            layout = []
+            for n, question_type in enumerate(QUESTION_MIX, start=1):
+                question_id += 1
+                layout.append({"id": question_id, "type": question_type})
+                questions.append({
+                    "id": question_id, "quiz_id": quiz_id, "question_text": f"Question {n}",
+                    "question_type": question_type, "points": 2 if question_type == "mcq" else 5,
+                    "options_json": json.dumps(OPTIONS) if question_type == "mcq" else None,
+                    "correct_answer": '["A"]' if question_type == "mcq" else None,
+                })
+            quizzes.append({"id": quiz_id, "questions": layout})
+        db.session.execute(insert(QuizQuestion), questions)
+
+        # Earlier attempts, half of them still waiting for manual grading
+        submissions, answers = [], []
+        submission_id = 0
+        for quiz in quizzes:
+            for _ in range(args.existing_submissions):
+                submission_id += 1
+                graded = rng.random() < 0.5
+                submissions.append({
+                    "id": submission_id, "quiz_id": quiz["id"],
+                    "student_id": rng.randrange(first_student, first_student + args.students),
+                    "graded": graded, "total_score": 0 if graded else None,
+                })
+                for question in quiz["questions"]:
+                    if question["type"] == "mcq":
+                        choice = rng.choice(OPTIONS)
+                        answers.append({"submission_id": submission_id, "question_id": question["id"],
+                                        "answer_text": choice, "is_correct": choice == "A",
+                                        "score": 2 if choice == "A" else 0})
+                    elif question["type"] == "text":
+                        answers.append({"submission_id": submission_id, "question_id": question["id"],
+                                        "answer_text": "An answer", "score": 0 if graded else None})
+                    else:
+                        answers.append({"submission_id": submission_id, "question_id": question["id"],
+                                        "file_path": "seeded/answer.pdf", "score": 0 if graded else None})
+        if submissions:
+            db.session.execute(insert(QuizSubmission), submissions)
+            db.session.execute(insert(QuizAnswer), answers)
+        db.session.commit()
+        rebuild_stats()
+        db.engine.dispose()
+    return quizzes
+
+
+class _Recorder:
+    def __init__(self, app) -> None:
+        from sqlalchemy import event
+
+        from database import db
+
+        self.samples: List[Tuple[str, float, int, int]] = []
+        self.queries = 0
+        with app.app_context():
+            event.listen(db.engine, "before_cursor_execute", self._count)
+
+    def _count(self, *_):
+        self.queries += 1
+
+    def call(self, step: str, send):
+        self.queries = 0
+        started = time.perf_counter()
+        response = send()
+        self.samples.append((step, time.perf_counter() - started, self.queries, response.status_code))
+        return response
+
+
+def student_flow(client, recorder: _Recorder, email: str, quiz: dict, rng: random.Random) -> None:
+    recorder.call("login", lambda: client.post("/login", data={"email": email, "password": PASSWORD}))
+    recorder.call("dashboard", lambda: client.get("/dashboard"))
+    url = f"/quiz/{quiz['id']}"
+    recorder.call("quiz_take GET", lambda: client.get(url))
+    form = {}
+    for question in quiz["questions"]:
+        if question["type"] == "mcq":
+            form[f"q_{question['id']}"] = rng.choice(OPTIONS)
+        elif question["type"] == "text":
+            form[f"q_{question['id']}"] = "My answer " * rng.randint(5, 50)
+        else:
+            # A few distinct files so content-addressed storage sees both new and duplicate uploads
+            content = b"PDF-bench %d\n" % rng.randint(0, 20) * 1024
+            form[f"q_{question['id']}_file"] = (io.BytesIO(content), "answer.pdf")
+    recorder.call("quiz_take POST", lambda: client.post(url, data=form, content_type="multipart/form-data"))
+    recorder.call("quiz_results (student)", lambda: client.get(f"{url}/results"))
+    client.get("/logout")
+
+
+def teacher_flow(client, recorder: _Recorder, email: str, quiz: dict) -> None:
+    recorder.call("login", lambda: client.post("/login", data={"email": email, "password": PASSWORD}))
+    recorder.call("dashboard", lambda: client.get("/dashboard"))
+    response = recorder.call("quiz_results (teacher)", lambda: client.get(f"/quiz/{quiz['id']}/results?pending=1"))
+    for block in response.get_data(as_text=True).split('<div class="submission">')[1:]:
+        match = re.search(r'name="submission_id" value="(\d+)"', block)
+        if match:
+            scores = {f"score_{answer_id}": "3" for answer_id in re.findall(r'name="score_(\d+)"', block)}
+            recorder.call("quiz_grade_submission",
+                          lambda: client.post(f"/quiz/{match.group(1)}/grade", data=scores))
+            break
+    client.get("/logout")
+
+
+def worker(task):
+    db_path, smtp_port, index, args, quizzes, start_at = task
+    rng = random.Random(args.seed * 1000 + index)
+    app = make_app(db_path, smtp_port)
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+    recorder = _Recorder(app)
+    first_student = args.teachers + 1
+    while time.time() < start_at:
+        time.sleep(0.001)
+    started = time.time()
+    for n in range(args.iterations):
+        client = app.test_client()
+        if index < args.teacher_workers:
+            teacher_id = 1 + (index + n) % args.teachers
+            teacher_flow(client, recorder, f"teacher{teacher_id}@example.com", quizzes[(index + n) % len(quizzes)])
+        else:
+            student_id = first_student + rng.randrange(args.students)
+            student_flow(client, recorder, f"student{student_id}@example.com", rng.choice(quizzes), rng)
+    return started, time.time(), recorder.samples
+
+
+# --- Reporting -----------------------------------------------------------------
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(results) -> Dict:
+    by_step: Dict[str, List[Tuple[float, int, int]]] = {}
+    for _, _, samples in results:
+        for step, seconds, queries, status in samples:
+            by_step.setdefault(step, []).append((seconds, queries, status))
+    steps = {}
+    for step, samples in sorted(by_step.items()):
+        latencies = sorted(seconds for seconds, _, _ in samples)
+        steps[step] = {
+            "count": len(samples),
+            "errors": sum(1 for _, _, status in samples if status >= 400),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "queries_per_request": round(sum(q for _, q, _ in samples) / len(samples), 2),
+        }
+    wall = max(end for _, end, _ in results) - min(start for start, _, _ in results)
+    total = sum(step["count"] for step in steps.values())
+    return {"requests": total, "seconds": round(wall, 2), "throughput_rps": round(total / wall, 1), "steps": steps}
+
+
+def print_report(summary: Dict) -> None:
+    print(f"{'step':26s} {'count':>6s} {'errors':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'queries':>8s}")
+    for step, s in summary["steps"].items():
+        print(f"{step:26s} {s['count']:6d} {s['errors']:6d} {s['p50_ms']:9.1f} {s['p95_ms']:9.1f} "
+              f"{s['p99_ms']:9.1f} {s['queries_per_request']:8.1f}")
+    print(f"{summary['requests']} requests in {summary['seconds']} s = {summary['throughput_rps']} requests/s")
+    if "notifications" in summary:
+        print("notifications delivered: {emails} emails, {whatsapp} WhatsApp in {seconds} s".format(**summary["notifications"]))
+
+
+def compare(summary: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    # Latency and throughput are allowed to drift by `tolerance`; query counts are
+    # deterministic, so any increase beyond rounding noise is a regression.
+    problems = []
+    for step, base in baseline["steps"].items():
+        current = summary["steps"].get(step)
+        if current is None:
+            problems.append(f"{step}: missing from this run")
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"{step}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if current["queries_per_request"] > base["queries_per_request"] + 0.5:
+            problems.append(f"{step}: {current['queries_per_request']} queries/request "
+                            f"vs baseline {base['queries_per_request']}")
+        if current["errors"] > base["errors"]:
+            problems.append(f"{step}: {current['errors']} errors vs baseline {base['errors']}")
+    if summary["throughput_rps"] < baseline["throughput_rps"] * (1 - tolerance):
+        problems.append(f"throughput {summary['throughput_rps']} requests/s vs baseline {baseline['throughput_rps']}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=8, help="concurrent client processes")
+    parser.add_argument("--teacher-workers", type=int, default=1, help="how many of the workers act as teachers")
+    parser.add_argument("--iterations", type=int, default=25, help="flows per worker")
+    parser.add_argument("--teachers", type=int, default=3)
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--quizzes", type=int, default=5)
+    parser.add_argument("--existing-submissions", type=int, default=200, help="seeded submissions per quiz")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", help="compare against this JSON summary; exit 1 on regression")
+    parser.add_argument("--save-baseline", help="write this run's summary as JSON")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed latency/throughput drift")
+    args = parser.parse_args()
+
+    smtp = start_smtp_server()
+    smtp_port = smtp.server_address[1]
+    db_path = os.path.join(WORKDIR, "exam_day.db")
+    app = make_app(db_path, smtp_port)
+    quizzes = seed(app, args)
+
+    start_at = time.time() + 2.0
+    tasks = [(db_path, smtp_port, i, args, quizzes, start_at) for i in range(args.workers)]
+    with multiprocessing.get_context("fork").Pool(args.workers) as pool:
+        results = pool.map(worker, tasks)
+    summary = summarize(results)
+
+    # Deliver everything the run queued through the local SMTP server and Twilio stub
+    twilio = StubTwilio()
+    app.extensions["notifier"]._twilio_client = twilio
+    started = time.perf_counter()
+    app.extensions["outbox_worker"].drain()
+    summary["notifications"] = {
+        "emails": smtp.messages, "whatsapp": twilio.sent, "seconds": round(time.perf_counter() - started, 2),
+    }
+    summary["config"] = {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline", "tolerance")}
+    print_report(summary)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fh:
+            json.dump(summary, fh, indent=2, sort_keys=True)
+        print(f"baseline written to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        if baseline.get("config") != summary["config"]:
+            print("warning: baseline was recorded with different parameters")
+        problems = compare(summary, baseline, args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print("no regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
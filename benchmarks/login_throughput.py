@@ -0,0 +1,78 @@
+"""Logins per second per core for candidate PASSWORD_HASH_METHOD settings, to
+size the worker pool for the morning login peak. Measures the raw hash check
+and the full POST /login request (single process, so one core), and shows
+that accounts hashed with the old method are upgraded on first login.
+
+    python benchmarks/login_throughput.py [--logins 50] [--method pbkdf2:sha256:100000 ...]
+"""
+import argparse
+import os
+import time
+
+from _common import scratch_dir
+
+WORKDIR = scratch_dir("bench-login-")
+
+from sqlalchemy import insert, select  # noqa: E402
+from werkzeug.security import check_password_hash, generate_password_hash  # noqa: E402
+
+from database import db  # noqa: E402
+from models import User  # noqa: E402
+
+DEFAULT_METHODS = ["scrypt", "pbkdf2:sha256:600000", "pbkdf2:sha256:260000", "pbkdf2:sha256:100000"]
+PASSWORD = "correct horse battery staple"
+
+
+def measure(method: str, logins: int) -> None:
+    from app import create_app, init_db
+
+    db_path = os.path.join(WORKDIR, f"{abs(hash(method))}.db")
+    app = create_app({
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "PASSWORD_HASH_METHOD": method,
+        "RATELIMIT_ENABLED": False,
+        "METRICS_ENABLED": False,
+    })
+    init_db(app)
+    stored = generate_password_hash(PASSWORD, method)
+    started = time.perf_counter()
+    for _ in range(logins):
+        check_password_hash(stored, PASSWORD)
+    raw_rate = logins / (time.perf_counter() - started)
+
+    # Accounts start with a cheap legacy hash so the first login shows the upgrade path
+    legacy = generate_password_hash(PASSWORD, "pbkdf2:sha256:1000")
+    with app.app_context():
+        db.session.execute(insert(User), [
+            {"name": f"Student {i}", "email": f"s{i}@example.com", "password_hash": legacy, "role": "student"}
+            for i in range(logins)
+        ])
+        db.session.commit()
+
+    def login_all() -> float:
+        started = time.perf_counter()
+        for i in range(logins):
+            response = app.test_client().post("/login", data={"email": f"s{i}@example.com", "password": PASSWORD})
+            assert response.status_code == 302, response.status_code
+        return logins / (time.perf_counter() - started)
+
+    upgrade_rate = login_all()
+    with app.app_context():
+        hashes = db.session.scalars(select(User.password_hash)).all()
+    upgraded = sum(1 for h in hashes if not h.startswith("pbkdf2:sha256:1000$"))
+    login_rate = login_all()
+    print(f"{method:24s} {raw_rate:10.1f} {login_rate:12.1f} {upgrade_rate:14.1f}   {upgraded}/{logins}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--method", action="append", help="hash method to measure (repeatable)")
+    args = parser.parse_args()
+    print(f"{'method':24s} {'verify/s':>10s} {'logins/s':>12s} {'rehash-login/s':>14s}   upgraded")
+    for method in args.method or DEFAULT_METHODS:
+        measure(method, args.logins)
+
+
+if __name__ == "__main__":
+    main()
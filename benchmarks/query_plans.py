@@ -0,0 +1,140 @@
+"""Show SQLite query plans and timings for the hot queries, without and with the
+secondary indexes declared in models.py.
+
+    python benchmarks/query_plans.py [--quizzes 20] [--submissions 500]
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from _common import scratch_dir
+
+scratch_dir("bench-plans-", "bench.db")
+
+from sqlalchemy import insert, select, text  # noqa: E402
+
+from database import db  # noqa: E402
+from models import (  # noqa: E402
+    Announcement,
+    Lesson,
+    NotificationOutbox,
+    Quiz,
+    QuizAnswer,
+    QuizQuestion,
+    QuizSubmission,
+    User,
+)
+
+
+def seed(args) -> None:
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    users = [{"id": 1, "name": "Teacher", "email": "t@example.com", "password_hash": "x", "role": "teacher"}]
+    users += [
+        {"id": i, "name": f"Student {i}", "email": f"s{i}@example.com", "password_hash": "x", "role": "student"}
+        for i in range(2, args.students + 2)
+    ]
+    db.session.execute(insert(User), users)
+    db.session.execute(insert(Lesson), [
+        {"title": f"Lesson {i}", "created_by_id": 1, "created_at": now - timedelta(hours=i)} for i in range(args.lessons)
+    ])
+    db.session.execute(insert(Announcement), [
+        {"title": f"News {i}", "content": "...", "created_by_id": 1, "created_at": now - timedelta(hours=i)}
+        for i in range(args.lessons)
+    ])
+    db.session.execute(insert(Quiz), [
+        {"id": q, "title": f"Quiz {q}", "created_by_id": 1, "is_active": q % 3 == 0, "created_at": now - timedelta(days=q)}
+        for q in range(1, args.quizzes + 1)
+    ])
+    questions = [
+        {"id": (q - 1) * args.questions + n, "quiz_id": q, "question_text": f"Q{n}", "question_type": "mcq",
+         "correct_answer": '["A"]', "points": 1}
+        for q in range(1, args.quizzes + 1) for n in range(1, args.questions + 1)
+    ]
+    db.session.execute(insert(QuizQuestion), questions)
+    submissions, answers = [], []
+    submission_id = 0
+    for q in range(1, args.quizzes + 1):
+        for _ in range(args.submissions):
+            submission_id += 1
+            submissions.append({
+                "id": submission_id, "quiz_id": q, "student_id": rng.randint(2, args.students + 1),
+                "submitted_at": now - timedelta(seconds=rng.randint(0, 86400)), "graded": True, "total_score": 0,
+            })
+            for n in range(1, args.questions + 1):
+                answers.append({"submission_id": submission_id, "question_id": (q - 1) * args.questions + n,
+                                "answer_text": "A", "is_correct": True, "score": 1})
+    db.session.execute(insert(QuizSubmission), submissions)
+    db.session.execute(insert(QuizAnswer), answers)
+    db.session.commit()
+
+
+def hot_queries(args):
+    quiz_id = args.quizzes // 2
+    return {
+        "teacher dashboard quizzes": select(Quiz).where(Quiz.created_by_id == 1).order_by(Quiz.created_at.desc()),
+        "student dashboard quizzes": select(Quiz).where(Quiz.is_active.is_(True)).order_by(Quiz.created_at.desc()),
+        "lessons list": select(Lesson).order_by(Lesson.created_at.desc()),
+        "announcements list": select(Announcement).order_by(Announcement.created_at.desc()),
+        "quiz questions": select(QuizQuestion).where(QuizQuestion.quiz_id == quiz_id),
+        "results page (keyset)": select(QuizSubmission).where(QuizSubmission.quiz_id == quiz_id)
+        .order_by(QuizSubmission.submitted_at.desc(), QuizSubmission.id.desc()).limit(51),
+        "student's latest submission": select(QuizSubmission)
+        .where(QuizSubmission.quiz_id == quiz_id, QuizSubmission.student_id == 2)
+        .order_by(QuizSubmission.submitted_at.desc()).limit(1),
+        "answers of a submission": select(QuizAnswer).where(QuizAnswer.submission_id == quiz_id * args.submissions),
+        "outbox claim": select(NotificationOutbox.id).where(NotificationOutbox.status == "pending")
+        .order_by(NotificationOutbox.next_attempt_at).limit(20),
+    }
+
+
+def measure(queries, repeat: int):
+    results = {}
+    for name, stmt in queries.items():
+        sql = str(stmt.compile(db.engine, compile_kwargs={"literal_binds": True}))
+        plan = [row[-1] for row in db.session.execute(text("EXPLAIN QUERY PLAN " + sql))]
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            db.session.execute(text(sql)).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = (plan, statistics.median(timings))
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--quizzes", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--submissions", type=int, default=500, help="submissions per quiz")
+    parser.add_argument("--lessons", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from app import create_app, init_db
+
+    app = create_app()
+    init_db(app)
+    with app.app_context():
+        seed(args)
+        indexes = [index for table in db.metadata.sorted_tables for index in table.indexes]
+        for index in indexes:
+            index.drop(db.engine)
+        db.session.execute(text("ANALYZE"))
+        before = measure(hot_queries(args), args.repeat)
+        for index in indexes:
+            index.create(db.engine)
+        db.session.execute(text("ANALYZE"))
+        after = measure(hot_queries(args), args.repeat)
+
+    for name in before:
+        print(f"== {name}")
+        print(f"   before ({before[name][1]:8.3f} ms): " + " | ".join(before[name][0]))
+        print(f"   after  ({after[name][1]:8.3f} ms): " + " | ".join(after[name][0]))
+
+
+if __name__ == "__main__":
+    main()
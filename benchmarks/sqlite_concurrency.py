@@ -0,0 +1,112 @@
+"""Concurrent quiz submissions against SQLite: N writer processes each POST to
+/quiz/<id> as a different student. Compares the plain SQLite setup (no retry)
+with the production profile (WAL, tuned pragmas, retry-on-busy).
+
+    python benchmarks/sqlite_concurrency.py [--writers 8] [--submissions 50]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import time
+
+from _common import scratch_dir
+
+WORKDIR = scratch_dir("bench-sqlite-")
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+SCENARIOS = [
+    ("default profile, no retry", {"SQLITE_PROFILE": "default", "DB_WRITE_RETRY_ATTEMPTS": 1}),
+    ("production profile + retry", {"SQLITE_PROFILE": "production"}),
+]
+PASSWORD_HASH = generate_password_hash("bench", method="pbkdf2:sha256:1")
+
+
+def make_app(db_path: str, overrides: dict):
+    from app import create_app, init_db
+
+    config = {
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
+        "UPLOAD_FOLDER": os.path.join(WORKDIR, "uploads"),
+        "OUTBOX_RUN_WORKER": False,
+        "AUTO_NOTIFY_PARENTS": False,
+    }
+    config.update(overrides)
+    app = create_app(config)
+    init_db(app)
+    return app
+
+
+def seed(db_path: str, overrides: dict, writers: int, questions: int) -> None:
+    from database import db
+    from models import Quiz, QuizQuestion, User
+    from stats import init_quiz_stats
+
+    app = make_app(db_path, overrides)
+    with app.app_context():
+        teacher = User(name="Teacher", email="teacher@example.com", role="teacher", password_hash=PASSWORD_HASH)
+        db.session.add(teacher)
+        for i in range(writers):
+            db.session.add(User(name=f"Student {i}", email=f"s{i}@example.com", role="student", password_hash=PASSWORD_HASH))
+        quiz = Quiz(title="Exam", created_by=teacher)
+        db.session.add(quiz)
+        for n in range(questions):
+            db.session.add(QuizQuestion(quiz=quiz, question_text=f"Q{n}", question_type="mcq",
+                                        options_json='["A", "B"]', correct_answer='["A"]', points=1))
+        db.session.flush()
+        init_quiz_stats(quiz.id)
+        db.session.commit()
+        db.engine.dispose()
+
+
+def writer(task):
+    db_path, overrides, index, submissions, questions, start_at = task
+    app = make_app(db_path, overrides)
+    app.config["PROPAGATE_EXCEPTIONS"] = False
+    client = app.test_client()
+    client.post("/login", data={"email": f"s{index}@example.com", "password": "bench"})
+    form = {f"q_{n}": "A" for n in range(1, questions + 1)}
+    while time.time() < start_at:
+        time.sleep(0.001)
+    ok, failed, latencies = 0, 0, []
+    for _ in range(submissions):
+        started = time.perf_counter()
+        response = client.post("/quiz/1", data=form)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code == 302:
+            ok += 1
+        else:
+            failed += 1
+    return ok, failed, latencies
+
+
+def run(name: str, overrides: dict, args) -> None:
+    db_path = os.path.join(WORKDIR, f"{abs(hash(name))}.db")
+    seed(db_path, overrides, args.writers, args.questions)
+    start_at = time.time() + 2.0
+    tasks = [(db_path, overrides, i, args.submissions, args.questions, start_at) for i in range(args.writers)]
+    with multiprocessing.get_context("fork").Pool(args.writers) as pool:
+        results = pool.map(writer, tasks)
+    elapsed = max(sum(lat) for _, _, lat in results)
+    ok = sum(r[0] for r in results)
+    failed = sum(r[1] for r in results)
+    latencies = sorted(l for r in results for l in r[2])
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:32s} ok={ok:5d} failed={failed:5d} "
+          f"throughput={ok / elapsed:8.1f} submissions/s "
+          f"p50={statistics.median(latencies) * 1000:7.1f} ms p95={p95 * 1000:7.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8, help="parallel writer processes")
+    parser.add_argument("--submissions", type=int, default=50, help="submissions per writer")
+    parser.add_argument("--questions", type=int, default=20, help="MCQ questions in the quiz")
+    args = parser.parse_args()
+    for name, overrides in SCENARIOS:
+        run(name, overrides, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Startup time and memory per worker, to size `serve.py serve` on one box.
+Times a cold `import app`, create_app() and the first request in fresh
+interpreters, then starts the built-in pre-fork server with and without
+--preload and reads each worker's RSS and PSS (proportional set size, which
+splits pages shared between processes) from /proc after a warm-up. Linux only.
+
+    python benchmarks/startup.py [--runs 5] [--workers 4] [--threads 4] [--requests 200]
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from _common import ROOT, scratch_dir
+
+scratch_dir("bench-startup-", "bench.db")
+ENV = dict(os.environ, PYTHONPATH=ROOT)  # for the probes and servers started below
+
+# Runs in a fresh interpreter each time, so nothing is already imported
+_PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get("/login")
+assert response.status_code == 200, response.status_code
+served = time.perf_counter()
+print(json.dumps({
+    "import": imported - started, "create_app": created - imported, "first_request": served - created,
+    "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, "twilio_loaded": "twilio" in sys.modules,
+}))
+"""
+
+_TWILIO_PROBE = """
+import json, time
+import app
+started = time.perf_counter()
+import twilio.rest
+print(json.dumps({"twilio": time.perf_counter() - started}))
+"""
+
+
+def probe(code: str) -> Dict:
+    output = subprocess.run([sys.executable, "-c", code], env=ENV, check=True, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def ms(seconds: float) -> str:
+    return f"{seconds * 1000:8.1f} ms"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory_kb(pid: int) -> Dict[str, int]:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as fh:
+        for line in fh:
+            name, _, rest = line.partition(":")
+            if name in ("Rss", "Pss", "Private_Clean", "Private_Dirty"):
+                values[name] = int(rest.split()[0])
+    return values
+
+
+def children(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as fh:
+        return [int(child) for child in fh.read().split()]
+
+
+def measure_server(args, preload: bool) -> None:
+    port = free_port()
+    command = [sys.executable, os.path.join(ROOT, "serve.py"), "serve", "--server", "builtin",
+               "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers), "--threads", str(args.threads)]
+    if preload:
+        command.append("--preload")
+    url = f"http://127.0.0.1:{port}/login"
+    started = time.perf_counter()
+    master = subprocess.Popen(command, env=ENV, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(url, timeout=1).read()
+                break
+            except OSError:
+                if time.perf_counter() - started > 30:
+                    raise RuntimeError("server did not start")
+                time.sleep(0.01)
+        ready = time.perf_counter() - started
+
+        def fetch(_):
+            urllib.request.urlopen(url, timeout=10).read()
+
+        with ThreadPoolExecutor(max_workers=args.workers * args.threads) as pool:
+            list(pool.map(fetch, range(args.requests)))
+        workers = [memory_kb(pid) for pid in children(master.pid)]
+        parent = memory_kb(master.pid)
+    finally:
+        master.terminate()
+        master.wait(timeout=30)
+
+    label = "preload" if preload else "fork"
+    rss = statistics.mean(w["Rss"] for w in workers) / 1024
+    pss = statistics.mean(w["Pss"] for w in workers) / 1024
+    private = statistics.mean(w["Private_Clean"] + w["Private_Dirty"] for w in workers) / 1024
+    total = (sum(w["Pss"] for w in workers) + parent["Pss"]) / 1024
+    print(f"{label:8s} {ready * 1000:10.0f} ms {len(workers):8d} {rss:10.1f} {pss:10.1f} {private:10.1f} {total:12.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="warm-up requests before reading memory")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, "serve.py"), "init"], env=ENV, check=True, capture_output=True)
+    print(f"serve.py init (new database)   {ms(time.perf_counter() - started)}")
+    started = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, "serve.py"), "init"], env=ENV, check=True, capture_output=True)
+    print(f"serve.py init (already done)   {ms(time.perf_counter() - started)}")
+
+    probe(_PROBE)  # warm the OS file cache and bytecode caches
+    runs = [probe(_PROBE) for _ in range(args.runs)]
+    twilio = statistics.median(probe(_TWILIO_PROBE)["twilio"] for _ in range(args.runs))
+    print(f"\nFresh interpreter, median of {args.runs}:")
+    for key in ("import", "create_app", "first_request"):
+        print(f"  {key:28s} {ms(statistics.median(run[key] for run in runs))}")
+    print(f"  {'max RSS':28s} {statistics.median(run['maxrss_kb'] for run in runs) / 1024:8.1f} MB")
+    print(f"  twilio imported at startup   {'yes' if runs[0]['twilio_loaded'] else 'no'}"
+          f" (importing it costs {ms(twilio).strip()} on first WhatsApp send)")
+
+    print(f"\nBuilt-in pre-fork server, {args.workers} workers x {args.threads} threads, "
+          f"after {args.requests} requests (MB per worker):")
+    print(f"{'mode':8s} {'ready':>13s} {'workers':>8s} {'RSS':>10s} {'PSS':>10s} {'private':>10s} {'total PSS':>12s}")
+    for preload in (False, True):
+        measure_server(args, preload)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+_MISSING = object()
+
+
+class LocalCache:
+    # In-process LRU with per-entry expiry. Also the stand-in for the shared
+    # backend in tests and single-process deployments.
+    def __init__(self, max_entries: int = 1024) -> None:
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    # Shared backend so every worker process sees the same entries and
+    # invalidations. Values must be JSON serialisable.
+    def __init__(self, url: str, prefix: str = "elearning:") -> None:
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from exc
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Any:
+        raw = self._client.get(self.prefix + key)
+        return _MISSING if raw is None else json.loads(raw)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self._client.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        keys = list(self._client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+
+class Cache:
+    def __init__(self, backend, default_ttl: float = 60.0) -> None:
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_or_set(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        value = self.backend.get(key)
+        if value is not _MISSING:
+            with self._lock:
+                self.hits += 1
+            return value
+        with self._lock:
+            self.misses += 1
+        value = loader()
+        self.backend.set(key, value, self.default_ttl if ttl is None else ttl)
+        return value
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.backend.delete(key)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else None,
+        }
+
+
+def create_cache(config) -> Cache:
+    if config.get("CACHE_BACKEND") == "redis":
+        backend = RedisCache(config["CACHE_REDIS_URL"])
+    else:
+        backend = LocalCache(config.get("CACHE_MAX_ENTRIES", 1024))
+    return Cache(backend, config.get("CACHE_TTL", 60))
+
+
+def create_user_cache(config) -> Cache:
+    # Logged-in user snapshots get their own cache: one entry per active user
+    # would otherwise evict the shared lists and swamp their hit/miss counts
+    if config.get("CACHE_BACKEND") == "redis":
+        backend = RedisCache(config["CACHE_REDIS_URL"], prefix="elearning-users:")
+    else:
+        backend = LocalCache(config.get("USER_CACHE_MAX_ENTRIES", 10000))
+    return Cache(backend, config.get("USER_CACHE_TTL", 30))
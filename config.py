@@ -8,11 +8,31 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # SQLite tuning. 'production' enables WAL so readers never block the writer,
+    # relaxes fsync to NORMAL (safe with WAL) and enlarges the page cache/mmap.
+    # 'default' leaves SQLite's own settings apart from the busy timeout.
+    SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "production")
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))  # bytes
+    SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024))  # negative = KiB
+    # Retries when a submission write hits "database is locked"
+    DB_WRITE_RETRY_ATTEMPTS = int(os.environ.get("DB_WRITE_RETRY_ATTEMPTS", 5))
+    DB_WRITE_RETRY_BACKOFF = float(os.environ.get("DB_WRITE_RETRY_BACKOFF", 0.05))  # seconds, doubled per retry
+
     # File uploads
     UPLOAD_FOLDER = os.environ.get(
         "UPLOAD_FOLDER", os.path.join(os.path.dirname(__file__), "uploads")
     )
     MAX_CONTENT_LENGTH = int(os.environ.get("MAX_CONTENT_LENGTH", 32 * 1024 * 1024))  # 32 MB
+    UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 1024 * 1024))  # bytes hashed/written per read
+    # How downloads are served: 'direct' (Python streams the file, with Range support),
+    # 'x-accel-redirect' (nginx internal location at UPLOAD_ACCEL_PREFIX mapped to
+    # UPLOAD_FOLDER/blobs) or 'x-sendfile' (Apache/lighttpd)
+    UPLOAD_SERVE_MODE = os.environ.get("UPLOAD_SERVE_MODE", "direct")
+    UPLOAD_ACCEL_PREFIX = os.environ.get("UPLOAD_ACCEL_PREFIX", "/protected-uploads/")
+    UPLOAD_CACHE_MAX_AGE = int(os.environ.get("UPLOAD_CACHE_MAX_AGE", 365 * 24 * 3600))  # seconds
 
     # Mail settings (SMTP)
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "smtp.gmail.com")
@@ -21,6 +41,9 @@ class Config:
     MAIL_USERNAME = os.environ.get("MAIL_USERNAME", "")
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD", "")
     MAIL_FROM = os.environ.get("MAIL_FROM", os.environ.get("MAIL_USERNAME", ""))
+    MAIL_POOL_SIZE = int(os.environ.get("MAIL_POOL_SIZE", 1))  # long-lived authenticated SMTP sessions
+    MAIL_HEALTHCHECK_SECONDS = float(os.environ.get("MAIL_HEALTHCHECK_SECONDS", 30))  # NOOP idle sessions before reuse
+    MAIL_TIMEOUT = float(os.environ.get("MAIL_TIMEOUT", 30))
 
     # WhatsApp (Twilio)
     TWILIO_ACCOUNT_SID = os.environ.get("TWILIO_ACCOUNT_SID", "")
@@ -29,12 +52,88 @@ class Config:
 
     # App behavior
     AUTO_NOTIFY_PARENTS = os.environ.get("AUTO_NOTIFY_PARENTS", "true").lower() == "true"
+    RESULTS_PAGE_SIZE = int(os.environ.get("RESULTS_PAGE_SIZE", 50))  # submissions per quiz results page
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))  # rows fetched per cursor batch when exporting
+    REGRADE_BATCH_SIZE = int(os.environ.get("REGRADE_BATCH_SIZE", 1000))  # answers scored/updated per batch when re-grading
+
+    # Password hashing (werkzeug method string). Lower the cost, e.g.
+    # "pbkdf2:sha256:100000", to trade hash strength for login throughput; stored
+    # hashes made with another method are upgraded on the user's next login.
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+
+    # Login throttling with token buckets: a burst capacity refilled at a steady
+    # rate, per client IP and per account. 'local' is per process; 'redis' shares
+    # the buckets between workers. Behind a proxy, make sure request.remote_addr
+    # is the client address (e.g. werkzeug's ProxyFix), or a whole school shares one bucket.
+    RATELIMIT_ENABLED = os.environ.get("RATELIMIT_ENABLED", "true").lower() == "true"
+    RATELIMIT_BACKEND = os.environ.get("RATELIMIT_BACKEND", "local")
+    RATELIMIT_REDIS_URL = os.environ.get("RATELIMIT_REDIS_URL", os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    LOGIN_IP_CAPACITY = float(os.environ.get("LOGIN_IP_CAPACITY", 200))
+    LOGIN_IP_REFILL_PER_SEC = float(os.environ.get("LOGIN_IP_REFILL_PER_SEC", 10))
+    LOGIN_ACCOUNT_CAPACITY = float(os.environ.get("LOGIN_ACCOUNT_CAPACITY", 10))
+    LOGIN_ACCOUNT_REFILL_PER_SEC = float(os.environ.get("LOGIN_ACCOUNT_REFILL_PER_SEC", 0.1))
+
+    # Request instrumentation: Prometheus text at /metrics (optionally behind a bearer
+    # token) and a warning log with the SQL of any request slower than SLOW_REQUEST_MS.
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+    # Counters are per process. With several workers, each writes snapshots to this
+    # directory and /metrics reports the sum over all of them; `serve.py serve` uses
+    # a fresh temporary directory when it runs more than one worker. Under another
+    # server (gunicorn wsgi:app -w N) set it to an empty directory, cleared on restart.
+    METRICS_MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR", "")
+    METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 1.0))  # max staleness of other workers
+    SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 0))  # 0 disables the slow-request log
+
+    # Read-through cache for lists shown to every student. 'local' is per process
+    # (TTL bounds staleness across workers); 'redis' is shared and needs the redis package.
+    CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "local")
+    CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_TTL = float(os.environ.get("CACHE_TTL", 60))  # seconds
+    CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", 1024))
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 30))  # seconds a logged-in user's profile/role is reused
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get("USER_CACHE_MAX_ENTRIES", 10000))  # per process with the local backend
+    QUIZ_CACHE_SIZE = int(os.environ.get("QUIZ_CACHE_SIZE", 256))  # compiled quizzes (questions + answer key) kept per process
+
+    # Live updates (new announcements, quiz (de)activations) pushed over server-sent
+    # events at /events. 'local' fans out within one process, so with several worker
+    # processes use 'redis' to reach every connected client. Each open stream holds
+    # a server thread: streams are capped per process (serve.py adds that many
+    # threads per worker) and closed after SSE_STREAM_SECONDS, when browsers
+    # reconnect and replay missed events by Last-Event-ID.
+    PUBSUB_BACKEND = os.environ.get("PUBSUB_BACKEND", "local")
+    PUBSUB_REDIS_URL = os.environ.get("PUBSUB_REDIS_URL", os.environ.get("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    SSE_MAX_CLIENTS = int(os.environ.get("SSE_MAX_CLIENTS", 50))  # per process
+    SSE_STREAM_SECONDS = float(os.environ.get("SSE_STREAM_SECONDS", 300))
+    SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", 15))
+    SSE_RETRY_MS = int(os.environ.get("SSE_RETRY_MS", 5000))  # browser reconnect delay
+
+    # Search over lessons, announcements and quiz questions (SQLite FTS5, see search.py)
+    SEARCH_PAGE_SIZE = int(os.environ.get("SEARCH_PAGE_SIZE", 20))
+
+    # Background jobs (reset, bulk grading, re-grading, exports) run in a process
+    # pool; JOBS_WORKERS=0 runs them inline in the request instead.
+    JOBS_WORKERS = int(os.environ.get("JOBS_WORKERS", 2))
+    JOBS_START_METHOD = os.environ.get("JOBS_START_METHOD", "spawn")
+    JOBS_OUTPUT_FOLDER = os.environ.get(
+        "JOBS_OUTPUT_FOLDER", os.path.join(os.path.dirname(__file__), "job_output")
+    )
+
+    # Notification outbox (parent alerts are delivered by background workers)
+    OUTBOX_RUN_WORKER = os.environ.get("OUTBOX_RUN_WORKER", "true").lower() == "true"  # start worker threads in server processes
+    OUTBOX_WORKERS = int(os.environ.get("OUTBOX_WORKERS", 2))
+    OUTBOX_POLL_INTERVAL = float(os.environ.get("OUTBOX_POLL_INTERVAL", 2.0))  # seconds
+    OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 20))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 6))
+    OUTBOX_BACKOFF_SECONDS = float(os.environ.get("OUTBOX_BACKOFF_SECONDS", 30.0))  # doubled per attempt
+    OUTBOX_LEASE_SECONDS = int(os.environ.get("OUTBOX_LEASE_SECONDS", 300))  # reclaim stuck deliveries after this
 
 
 def ensure_directories(config) -> None:
     # Works with both Config objects and Flask app.config mappings
-    upload_folder = getattr(config, "UPLOAD_FOLDER", None)
-    if not upload_folder and isinstance(config, dict):
-        upload_folder = config.get("UPLOAD_FOLDER")
-    if upload_folder:
-        os.makedirs(upload_folder, exist_ok=True)
\ No newline at end of file
+    for name in ("UPLOAD_FOLDER", "JOBS_OUTPUT_FOLDER"):
+        folder = getattr(config, name, None)
+        if not folder and isinstance(config, dict):
+            folder = config.get(name)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
\ No newline at end of file
@@ -1,4 +1,70 @@
+import random
+import time
+from typing import Callable, Dict, TypeVar
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, insert
+from sqlalchemy.exc import OperationalError
+
+
+db = SQLAlchemy()
+
+T = TypeVar("T")
+
+
+def configure_sqlite(app) -> None:
+    # Applies the SQLITE_* pragmas to every new connection. Must run before the
+    # engine opens its first connection (i.e. right after db.init_app).
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite":
+        return
+
+    config = app.config
+    pragmas = [("busy_timeout", int(config["SQLITE_BUSY_TIMEOUT_MS"]))]
+    if config["SQLITE_PROFILE"] == "production":
+        pragmas += [
+            ("journal_mode", config["SQLITE_JOURNAL_MODE"]),
+            ("synchronous", config["SQLITE_SYNCHRONOUS"]),
+            ("mmap_size", int(config["SQLITE_MMAP_SIZE"])),
+            ("cache_size", int(config["SQLITE_CACHE_SIZE"])),
+        ]
+
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def is_busy_error(exc: OperationalError) -> bool:
+    message = str(getattr(exc, "orig", exc)).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def commit_with_retry(work: Callable[[], T], attempts: int = 5, backoff_seconds: float = 0.05) -> T:
+    # Runs work() and commits; if SQLite reports the database as locked the
+    # transaction is rolled back and replayed with jittered exponential backoff.
+    # work() must therefore only touch the session (no side effects elsewhere).
+    attempt = 0
+    while True:
+        try:
+            result = work()
+            db.session.commit()
+            return result
+        except OperationalError as exc:
+            db.session.rollback()
+            attempt += 1
+            if not is_busy_error(exc) or attempt >= attempts:
+                raise
+            time.sleep(backoff_seconds * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+
 
+def insert_returning_id(model, values: Dict) -> int:
+    # Single INSERT that hands back the new primary key (RETURNING where supported)
+    stmt = insert(model).values(**values)
+    if db.engine.dialect.insert_returning:
+        return db.session.execute(stmt.returning(model.id)).scalar_one()
+    return db.session.execute(stmt).inserted_primary_key[0]
 
-db = SQLAlchemy()
\ No newline at end of file
@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+from typing import Iterator
+
+from sqlalchemy import select
+
+from database import db
+from models import User, QuizAnswer, QuizQuestion, QuizSubmission
+
+
+EXPORT_COLUMNS = [
+    "submission_id",
+    "student_id",
+    "student_name",
+    "student_email",
+    "submitted_at",
+    "graded",
+    "total_score",
+    "answer_id",
+    "question_id",
+    "question_type",
+    "question_text",
+    "answer_text",
+    "file_path",
+    "is_correct",
+    "score",
+]
+
+
+def _export_rows(quiz_id: int, batch_size: int):
+    # One flat row per answer, fetched from the cursor in batches of `batch_size`
+    stmt = (
+        select(
+            QuizSubmission.id,
+            User.id,
+            User.name,
+            User.email,
+            QuizSubmission.submitted_at,
+            QuizSubmission.graded,
+            QuizSubmission.total_score,
+            QuizAnswer.id,
+            QuizQuestion.id,
+            QuizQuestion.question_type,
+            QuizQuestion.question_text,
+            QuizAnswer.answer_text,
+            QuizAnswer.file_path,
+            QuizAnswer.is_correct,
+            QuizAnswer.score,
+        )
+        .join(User, QuizSubmission.student_id == User.id)
+        .outerjoin(QuizAnswer, QuizAnswer.submission_id == QuizSubmission.id)
+        .outerjoin(QuizQuestion, QuizAnswer.question_id == QuizQuestion.id)
+        .where(QuizSubmission.quiz_id == quiz_id)
+        .order_by(QuizSubmission.id, QuizAnswer.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in db.session.execute(stmt):
+        yield dict(zip(EXPORT_COLUMNS, row))
+
+
+def iter_csv(quiz_id: int, batch_size: int = 1000) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    # Send the header right away, then one chunk per batch of rows
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    pending = 0
+    for row in _export_rows(quiz_id, batch_size):
+        if row["submitted_at"] is not None:
+            row["submitted_at"] = row["submitted_at"].isoformat()
+        writer.writerow(row)
+        pending += 1
+        if pending >= batch_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    if pending:
+        yield buffer.getvalue()
+
+
+def iter_jsonl(quiz_id: int, batch_size: int = 1000) -> Iterator[str]:
+    lines = []
+    started = False
+    for row in _export_rows(quiz_id, batch_size):
+        if row["submitted_at"] is not None:
+            row["submitted_at"] = row["submitted_at"].isoformat()
+        lines.append(json.dumps(row))
+        # First row goes out immediately, the rest one chunk per batch
+        if not started or len(lines) >= batch_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+            started = True
+    if lines:
+        yield "\n".join(lines) + "\n"
@@ -0,0 +1,226 @@
+import json
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, text, update
+
+from database import db
+from models import Quiz, QuizAnswer, QuizQuestion, QuizSubmission, User
+from outbox import enqueue_email, enqueue_whatsapp
+from stats import rebuild_quiz_stats, record_bulk_grade
+
+
+# QuizQuestion.correct_answer holds a JSON list of the accepted options, even
+# when there is only one. Keys used to be plain text (migration 4 converts
+# them), so text that is not a JSON list is still read as a single answer.
+
+def normalize_answer(text: Optional[str]) -> str:
+    # Case-insensitive and whitespace-insensitive: " Paris  city" == "paris city"
+    return " ".join((text or "").split()).casefold()
+
+
+def parse_correct_answers(raw: Optional[str]) -> List[str]:
+    if not raw:
+        return []
+    try:
+        values = json.loads(raw)
+    except ValueError:
+        return [raw]
+    if isinstance(values, list):
+        return [str(v) for v in values if str(v).strip()]
+    return [raw]
+
+
+def dump_correct_answers(answers: Iterable[str]) -> Optional[str]:
+    answers = [a.strip() for a in answers if a and a.strip()]
+    return json.dumps(answers) if answers else None
+
+
+def _legacy_answers(raw: str, options_json: Optional[str]) -> List[str]:
+    # A key written before migration 4 is plain text unless several options
+    # were accepted. Text that matches one of the question's options is that
+    # option, even when it looks like a JSON list.
+    try:
+        options = {normalize_answer(str(o)) for o in json.loads(options_json or "[]")}
+    except (TypeError, ValueError):
+        options = set()
+    if raw.startswith("[") and normalize_answer(raw) not in options:
+        try:
+            values = json.loads(raw)
+        except ValueError:
+            values = None
+        if isinstance(values, list):
+            return [str(v) for v in values]
+    return [raw]
+
+
+def upgrade_answer_keys(conn) -> None:
+    # Migration 4: store every existing answer key as a JSON list
+    rows = conn.execute(text(
+        "SELECT id, options_json, correct_answer FROM quiz_questions WHERE correct_answer IS NOT NULL"
+    )).all()
+    params = [
+        {"id": question_id, "key": dump_correct_answers(_legacy_answers(raw, options_json))}
+        for question_id, options_json, raw in rows
+    ]
+    if params:
+        conn.execute(text("UPDATE quiz_questions SET correct_answer = :key WHERE id = :id"), params)
+
+
+def split_answer_input(value: str) -> List[str]:
+    # Form fields accept several correct options separated by "|"; "\|" is a
+    # literal "|" inside an option and "\\" a literal backslash
+    parts, current, chars = [], [], iter(value or "")
+    for char in chars:
+        if char == "\\":
+            following = next(chars, "")
+            current.append(following if following in ("|", "\\") else char + following)
+        elif char == "|":
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def join_answer_input(answers: Iterable[str]) -> str:
+    # Inverse of split_answer_input, to show a stored answer key in a form field
+    return " | ".join(a.replace("\\", "\\\\").replace("|", "\\|") for a in answers)
+
+
+class AnswerKey:
+    # Normalized accepted answers and points of every MCQ question of one quiz
+    # version. Immutable once built; compiled quizzes share it between requests
+    # and threads (see quiz_cache.py).
+    __slots__ = ("quiz_id", "version", "_mcq")
+
+    def __init__(self, quiz_id: int, version: int, mcq: Dict[int, Tuple[FrozenSet[str], int]]) -> None:
+        self.quiz_id = quiz_id
+        self.version = version
+        self._mcq = mcq
+
+    @classmethod
+    def compile(cls, quiz_id: int, version: int, questions) -> "AnswerKey":
+        mcq = {
+            q.id: (frozenset(normalize_answer(a) for a in parse_correct_answers(q.correct_answer)), q.points or 0)
+            for q in questions
+            if q.question_type == "mcq"
+        }
+        return cls(quiz_id, version, mcq)
+
+    def grade(self, question_id: int, answer_text: Optional[str]) -> Tuple[bool, int]:
+        accepted, points = self._mcq[question_id]
+        is_correct = normalize_answer(answer_text) in accepted
+        return is_correct, points if is_correct else 0
+
+
+def regrade_quiz(quiz: Quiz, batch_size: int = 1000) -> Tuple[int, int]:
+    # Re-scores every MCQ answer of the quiz against the current answer key.
+    # Answers are streamed in batches and only changed rows are written back,
+    # then graded submission totals and the quiz statistics are recomputed in
+    # set-based statements. Returns (answers changed, submissions re-totalled).
+    # The key is compiled here rather than taken from the quiz cache: it may
+    # reflect edits that are not committed yet.
+    key = AnswerKey.compile(quiz.id, quiz.version or 1, quiz.questions)
+    db.session.flush()
+    rows = db.session.execute(
+        select(QuizAnswer.id, QuizAnswer.question_id, QuizAnswer.answer_text, QuizAnswer.is_correct, QuizAnswer.score)
+        .join(QuizQuestion, QuizAnswer.question_id == QuizQuestion.id)
+        .where(QuizQuestion.quiz_id == quiz.id, QuizQuestion.question_type == "mcq")
+        .execution_options(yield_per=batch_size)
+    )
+    changed = []
+    for answer_id, question_id, answer_text, is_correct, score in rows:
+        new_correct, new_score = key.grade(question_id, answer_text)
+        if new_correct != is_correct or new_score != score:
+            changed.append({"id": answer_id, "is_correct": new_correct, "score": new_score})
+    for start in range(0, len(changed), batch_size):
+        db.session.execute(update(QuizAnswer), changed[start:start + batch_size])
+
+    answer_total = (
+        select(func.coalesce(func.sum(QuizAnswer.score), 0))
+        .where(QuizAnswer.submission_id == QuizSubmission.id)
+        .scalar_subquery()
+    )
+    result = db.session.execute(
+        update(QuizSubmission)
+        .where(QuizSubmission.quiz_id == quiz.id, QuizSubmission.graded.is_(True))
+        .values(total_score=answer_total)
+        .execution_options(synchronize_session=False)
+    )
+    rebuild_quiz_stats(quiz.id)
+    return len(changed), result.rowcount
+
+
+def grade_pending(quiz: Quiz, submission_ids: Iterable[int], manual_scores: Dict[int, str], notifier) -> List[int]:
+    # Finalises the still-pending submissions among submission_ids: text/file
+    # answers take the teacher's score from manual_scores (answer id -> form
+    # value, clamped to the question's points), totals are summed in SQL and
+    # each parent gets one digest covering all of their children. Returns the
+    # ids that were graded; the caller commits.
+    submission_ids = list(submission_ids)
+    if not submission_ids:
+        return []
+    pending_ids = db.session.scalars(
+        select(QuizSubmission.id).where(
+            QuizSubmission.quiz_id == quiz.id,
+            QuizSubmission.graded.isnot(True),
+            QuizSubmission.id.in_(submission_ids),
+        )
+    ).all()
+    if not pending_ids:
+        return []
+
+    # Score every answer of the pending submissions in one pass
+    answer_rows = db.session.execute(
+        select(QuizAnswer.id, QuizAnswer.score, QuizQuestion.question_type, QuizQuestion.points)
+        .join(QuizQuestion, QuizAnswer.question_id == QuizQuestion.id)
+        .where(QuizAnswer.submission_id.in_(pending_ids))
+    ).all()
+    score_updates = []
+    for answer_id, score, question_type, points in answer_rows:
+        if question_type in ("text", "file"):
+            try:
+                score = int(manual_scores.get(answer_id, "0"))
+            except ValueError:
+                score = 0
+            score_updates.append({"id": answer_id, "score": max(0, min(score, points or 0))})
+        elif score is None:
+            score_updates.append({"id": answer_id, "score": 0})
+    if score_updates:
+        db.session.execute(update(QuizAnswer), score_updates)
+
+    answer_total = (
+        select(func.coalesce(func.sum(QuizAnswer.score), 0))
+        .where(QuizAnswer.submission_id == QuizSubmission.id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(QuizSubmission)
+        .where(QuizSubmission.id.in_(pending_ids))
+        .values(total_score=answer_total, graded=True)
+        .execution_options(synchronize_session=False)
+    )
+    record_bulk_grade(quiz.id, pending_ids)
+
+    digests_by_email: Dict[str, List[str]] = {}
+    digests_by_whatsapp: Dict[str, List[str]] = {}
+    graded_rows = db.session.execute(
+        select(User.name, User.parent_email, User.parent_whatsapp, QuizSubmission.total_score)
+        .join(QuizSubmission, QuizSubmission.student_id == User.id)
+        .where(QuizSubmission.id.in_(pending_ids))
+        .order_by(User.name)
+    ).all()
+    for name, parent_email, parent_whatsapp, total_score in graded_rows:
+        line = f"Student {name} graded for quiz '{quiz.title}'. Score: {total_score}."
+        if parent_email:
+            digests_by_email.setdefault(parent_email, []).append(line)
+        if parent_whatsapp:
+            digests_by_whatsapp.setdefault(parent_whatsapp, []).append(line)
+    if notifier.email_enabled:
+        for parent_email, lines in digests_by_email.items():
+            enqueue_email(parent_email, "Quiz result", "\n".join(lines))
+    if notifier.whatsapp_enabled:
+        for parent_whatsapp, lines in digests_by_whatsapp.items():
+            enqueue_whatsapp(parent_whatsapp, "\n".join(lines))
+    return list(pending_ids)
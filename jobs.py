@@ -0,0 +1,299 @@
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import Flask
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import OperationalError
+
+from config import Config
+from database import configure_sqlite, db
+from exports import iter_csv, iter_jsonl
+from grading import grade_pending, regrade_quiz
+from models import Job, Quiz, QuizAnswer, QuizSubmission
+from notifications import Notifier
+from search import SearchIndex
+
+
+# Heavy teacher operations run outside the request: the route records a Job row
+# and hands its id to a process pool, the worker updates status/progress on the
+# row and teachers poll /jobs/<id>. Workers are spawned (not forked) and build a
+# minimal app from the submitting app's plain config values, so they share the
+# database and folders but none of the web process's threads or connections.
+# Each active job records the process it depends on (Job.owner); a job whose
+# owner has exited is failed the next time anyone polls, since nothing else
+# would ever finish it.
+ACTIVE = ("queued", "running")
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    host, _, pid = (owner or "").rpartition(":")
+    if not pid.isdigit():
+        return False  # submitted before jobs recorded their owner
+    if host != socket.gethostname():
+        return True  # another machine's process; it has to be trusted
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobContext:
+    def __init__(self, app: Flask, job_id: int) -> None:
+        self.app = app
+        self.job_id = job_id
+
+    def progress(self, percent: int, message: Optional[str] = None) -> None:
+        # Written on its own connection so pollers see it before the job commits.
+        # Best effort: skipped if the job's own transaction holds the write lock.
+        values: Dict[str, Any] = {"progress": max(0, min(100, int(percent)))}
+        if message is not None:
+            values["message"] = message[:255]
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(update(Job).where(Job.id == self.job_id).values(**values))
+        except OperationalError:
+            pass
+
+
+def _reset(ctx: JobContext, params: Dict) -> Dict:
+    # Danger: clears all data, uploads and job output (exports hold student
+    # answers). The jobs table survives, emptied of every other job, so this
+    # job can report back.
+    paths = [
+        os.path.join(folder, name)
+        for folder in (ctx.app.config["UPLOAD_FOLDER"], ctx.app.config["JOBS_OUTPUT_FOLDER"])
+        if os.path.isdir(folder)
+        for name in os.listdir(folder)
+    ]
+    for i, path in enumerate(paths, start=1):
+        try:
+            if os.path.isfile(path):
+                os.remove(path)
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+        except Exception:
+            pass
+        ctx.progress(50 * i // len(paths), "Deleting files")
+    ctx.progress(50, "Recreating database")
+    tables = [table for table in db.metadata.sorted_tables if table.name != Job.__tablename__]
+    db.metadata.drop_all(db.engine, tables=tables)
+    db.metadata.create_all(db.engine, tables=tables)
+    # The search index is not in db.metadata; rebuilt from the now empty tables
+    SearchIndex().rebuild()
+    db.session.execute(delete(Job).where(Job.id != ctx.job_id))
+    db.session.commit()
+    return {"message": "Application data reset."}
+
+
+def _grade_all(ctx: JobContext, params: Dict) -> Dict:
+    quiz = db.get_or_404(Quiz, params["quiz_id"])
+    manual_scores = {int(answer_id): score for answer_id, score in params.get("scores", {}).items()}
+    ctx.progress(10, "Grading submissions")
+    graded = grade_pending(quiz, params["submission_ids"], manual_scores, Notifier(ctx.app.config))
+    db.session.commit()
+    return {"message": f"Graded {len(graded)} submissions and notified parents.", "graded": len(graded)}
+
+
+def _regrade(ctx: JobContext, params: Dict) -> Dict:
+    quiz = db.get_or_404(Quiz, params["quiz_id"])
+    ctx.progress(10, "Re-scoring answers")
+    answers, submissions = regrade_quiz(quiz, ctx.app.config["REGRADE_BATCH_SIZE"])
+    db.session.commit()
+    return {
+        "message": f"Re-graded '{quiz.title}': {answers} answers changed, {submissions} totals recomputed.",
+        "answers_changed": answers,
+        "submissions_recomputed": submissions,
+    }
+
+
+def _export(ctx: JobContext, params: Dict) -> Dict:
+    quiz_id, fmt = params["quiz_id"], params["fmt"]
+    rows = iter_csv if fmt == "csv" else iter_jsonl
+    total = db.session.scalar(
+        select(func.count(QuizAnswer.id))
+        .join(QuizSubmission, QuizAnswer.submission_id == QuizSubmission.id)
+        .where(QuizSubmission.quiz_id == quiz_id)
+    ) or 1
+    path = os.path.join(ctx.app.config["JOBS_OUTPUT_FOLDER"], f"job_{ctx.job_id}.{fmt}")
+    written, next_report = 0, 5000
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        for chunk in rows(quiz_id, ctx.app.config["EXPORT_BATCH_SIZE"]):
+            fh.write(chunk)
+            written += chunk.count("\n")
+            if written >= next_report:
+                ctx.progress(min(95, 95 * written // total), f"Exported {written} rows")
+                next_report += 5000
+    return {
+        "message": "Export ready.",
+        "file": os.path.basename(path),
+        "download_name": f"quiz_{quiz_id}_submissions.{fmt}",
+    }
+
+
+HANDLERS: Dict[str, Callable[[JobContext, Dict], Dict]] = {
+    "reset": _reset,
+    "grade_all": _grade_all,
+    "regrade": _regrade,
+    "export": _export,
+}
+
+_apps: Dict[str, Flask] = {}
+
+
+def _job_app(config: Dict) -> Flask:
+    # One app (and engine) per distinct configuration, reused across jobs in a worker
+    key = json.dumps(config, sort_keys=True, default=str)
+    app = _apps.get(key)
+    if app is None:
+        app = Flask(__name__)
+        app.config.from_object(Config)
+        app.config.update(config)
+        db.init_app(app)
+        configure_sqlite(app)
+        _apps[key] = app
+    return app
+
+
+def run_job(job_id: int, config: Dict) -> str:
+    # Entry point in the worker process; returns the final status
+    app = _job_app(config)
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return "missing"
+        job.status, job.started_at, job.owner = "running", datetime.utcnow(), _owner()
+        kind, params = job.kind, json.loads(job.params_json or "{}")
+        db.session.commit()
+        try:
+            result = HANDLERS[kind](JobContext(app, job_id), params)
+            status, values = "succeeded", {"result_json": json.dumps(result), "progress": 100,
+                                           "message": result.get("message")}
+        except Exception as exc:
+            db.session.rollback()
+            app.logger.exception("Job %s (%s) failed", job_id, kind)
+            status, values = "failed", {"error": f"{type(exc).__name__}: {exc}", "message": "Failed"}
+        finally:
+            db.session.remove()
+        db.session.execute(
+            update(Job).where(Job.id == job_id).values(status=status, finished_at=datetime.utcnow(), **values)
+        )
+        db.session.commit()
+        return status
+
+
+class JobRunner:
+    def __init__(self, app: Flask, workers: int = 2, start_method: str = "spawn") -> None:
+        # workers=0 runs jobs synchronously in the submitting thread (tests, tiny installs)
+        self.app = app
+        self.workers = workers
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._callbacks: Dict[str, List[Callable[[int, str], None]]] = {}
+
+    @classmethod
+    def from_config(cls, app: Flask) -> "JobRunner":
+        return cls(app, workers=app.config["JOBS_WORKERS"], start_method=app.config["JOBS_START_METHOD"])
+
+    def on_finished(self, kind: str, callback: Callable[[int, str], None]) -> None:
+        # callback(job_id, status) runs in this process, e.g. to clear local caches
+        self._callbacks.setdefault(kind, []).append(callback)
+
+    def _worker_config(self) -> Dict:
+        return {
+            key: value for key, value in self.app.config.items()
+            if isinstance(value, (str, int, float, bool)) or value is None
+        }
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(self.start_method)
+                )
+            return self._executor
+
+    def submit(self, kind: str, params: Dict, created_by_id: Optional[int] = None) -> int:
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind=kind, params_json=json.dumps(params), created_by_id=created_by_id, owner=_owner())
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+        if self.workers <= 0:
+            self._finished(kind, job_id, run_job(job_id, self._worker_config()))
+            return job_id
+        future = self._pool().submit(run_job, job_id, self._worker_config())
+        future.add_done_callback(lambda f: self._done(kind, job_id, f))
+        return job_id
+
+    def _done(self, kind: str, job_id: int, future) -> None:
+        try:
+            status = future.result()
+        except Exception as exc:
+            # The worker process died (or could not start): record it so pollers stop waiting
+            status = "failed"
+            with self.app.app_context():
+                db.session.execute(
+                    update(Job).where(Job.id == job_id, Job.status.in_(ACTIVE))
+                    .values(status="failed", error=f"{type(exc).__name__}: {exc}", finished_at=datetime.utcnow())
+                )
+                db.session.commit()
+        self._finished(kind, job_id, status)
+
+    def _finished(self, kind: str, job_id: int, status: str) -> None:
+        for callback in self._callbacks.get(kind, []):
+            try:
+                callback(job_id, status)
+            except Exception:
+                self.app.logger.exception("Job callback failed for job %s", job_id)
+
+    def reap_orphans(self) -> int:
+        # Fails active jobs whose owning process is gone: a web worker that was
+        # restarted takes its queued jobs with it, a killed pool worker its running one
+        active = db.session.execute(select(Job.id, Job.owner).where(Job.status.in_(ACTIVE))).all()
+        orphans = [job_id for job_id, owner in active if not _owner_alive(owner)]
+        if orphans:
+            db.session.execute(
+                update(Job).where(Job.id.in_(orphans), Job.status.in_(ACTIVE))
+                .values(status="failed", message="Failed", error="The process running this job exited.",
+                        finished_at=datetime.utcnow())
+            )
+            db.session.commit()
+        return len(orphans)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+def job_payload(job: Job) -> Dict:
+    params = json.loads(job.params_json or "{}")
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "result": json.loads(job.result_json) if job.result_json else None,
+        "error": job.error,
+        "return_to": params.get("return_to"),
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,301 @@
+import glob
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+from database import db
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+_MAX_LOGGED_STATEMENTS = 200
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in pairs) + "}"
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_format_labels(labels)} {_format_number(value)}" for labels, value in items]
+        return lines
+
+    def empty(self) -> "Counter":
+        return Counter(self.name, self.help_text)
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+    def merge(self, snapshot: List) -> None:
+        for labels, value in snapshot:
+            self.inc(value, **dict(labels))
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float]) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        # labels -> ([count per bucket], sum, count)
+        self._values: Dict[Labels, Tuple[List[int], float, int]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items())
+        for labels, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_number(bound)))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+    def empty(self) -> "Histogram":
+        return Histogram(self.name, self.help_text, self.buckets)
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(labels), list(counts), total, count] for labels, (counts, total, count) in self._values.items()]
+
+    def merge(self, snapshot: List) -> None:
+        with self._lock:
+            for labels, counts, total, count in snapshot:
+                key = tuple(tuple(pair) for pair in labels)
+                old_counts, old_total, old_count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+                self._values[key] = ([a + b for a, b in zip(old_counts, counts)], old_total + total, old_count + count)
+
+
+class _RequestStats:
+    __slots__ = ("started", "queries", "query_seconds", "template_seconds", "notifier_seconds", "statements")
+
+    def __init__(self, record_statements: bool) -> None:
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.template_seconds = 0.0
+        self.notifier_seconds = 0.0
+        self.statements: Optional[List[Tuple[float, str]]] = [] if record_statements else None
+
+
+def _current() -> Optional[_RequestStats]:
+    return g.get("_request_stats") if has_request_context() else None
+
+
+class Metrics:
+    # Per-endpoint request metrics in Prometheus text format. SQL is timed with
+    # engine cursor events, templates with Flask's render signals, and notifier
+    # calls by wrapping the Notifier's batch send methods.
+    #
+    # With several worker processes, each one writes a snapshot of its counters
+    # to `multiprocess_dir` (from a thread every `flush_seconds`, and whenever it
+    # serves /metrics) and /metrics sums the snapshots of every worker, so the
+    # totals do not depend on which worker answers the scrape. Files of exited
+    # workers are kept so totals never go backwards.
+    def __init__(self, slow_request_ms: float = 0, multiprocess_dir: str = "", flush_seconds: float = 1.0) -> None:
+        self.slow_request_ms = slow_request_ms
+        self.multiprocess_dir = multiprocess_dir
+        self.flush_seconds = flush_seconds
+        self._snapshot_pid: Optional[int] = None
+        self._snapshot_path = ""
+        self._flush_lock = threading.Lock()
+        self.requests = Counter("http_requests_total", "Requests handled, by endpoint, method and status.")
+        self.latency = Histogram("http_request_duration_seconds", "Time to produce the response.", LATENCY_BUCKETS)
+        self.db_queries = Histogram("http_request_db_queries", "SQL statements executed per request.", QUERY_COUNT_BUCKETS)
+        self.db_seconds = Histogram("http_request_db_seconds", "Time spent executing SQL per request.", LATENCY_BUCKETS)
+        self.template_seconds = Histogram(
+            "http_request_template_seconds", "Time spent rendering templates per request.", LATENCY_BUCKETS
+        )
+        self.notifier_seconds = Counter(
+            "http_request_notifier_seconds_total", "Time spent in Notifier calls made while handling requests."
+        )
+        self.notifier_calls = Histogram(
+            "notifier_call_duration_seconds", "Duration of Notifier send calls (requests and outbox workers).",
+            LATENCY_BUCKETS,
+        )
+        self._collectors = [
+            self.requests, self.latency, self.db_queries, self.db_seconds,
+            self.template_seconds, self.notifier_seconds, self.notifier_calls,
+        ]
+
+    def init_app(self, app) -> None:
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        self._logger = app.logger
+
+    def instrument_notifier(self, notifier) -> None:
+        # send_email/send_whatsapp delegate to the *_many methods, so only those are wrapped
+        for name in ("send_email_many", "send_whatsapp_many"):
+            setattr(notifier, name, self._timed_call(name, getattr(notifier, name)))
+
+    def _timed_call(self, name: str, func):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                self.notifier_calls.observe(elapsed, method=name)
+                stats = _current()
+                if stats is not None:
+                    stats.notifier_seconds += elapsed
+        return wrapper
+
+    def _start_request(self) -> None:
+        g._request_stats = _RequestStats(record_statements=self.slow_request_ms > 0)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        # Kept on the execution context, which is discarded whether or not the statement fails
+        if context is not None and _current() is not None:
+            context._metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        stats = _current()
+        started = getattr(context, "_metrics_started", None)
+        if stats is None or started is None:
+            return
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.query_seconds += elapsed
+        if stats.statements is not None and len(stats.statements) < _MAX_LOGGED_STATEMENTS:
+            stats.statements.append((elapsed, statement))
+
+    def _before_render(self, sender, template, context, **extra) -> None:
+        if _current() is not None:
+            g._template_started = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra) -> None:
+        stats = _current()
+        started = g.pop("_template_started", None) if stats is not None else None
+        if started is not None:
+            stats.template_seconds += time.perf_counter() - started
+
+    def _finish_request(self, response):
+        # Streamed bodies (exports) are measured up to the first byte only
+        stats = g.pop("_request_stats", None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        endpoint = request.url_rule.endpoint if request.url_rule else "unmatched"
+        self.requests.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+        self.latency.observe(elapsed, endpoint=endpoint, method=request.method)
+        self.db_queries.observe(stats.queries, endpoint=endpoint)
+        self.db_seconds.observe(stats.query_seconds, endpoint=endpoint)
+        self.template_seconds.observe(stats.template_seconds, endpoint=endpoint)
+        if stats.notifier_seconds:
+            self.notifier_seconds.inc(stats.notifier_seconds, endpoint=endpoint)
+        if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+            self._log_slow_request(endpoint, elapsed, stats)
+        if self.multiprocess_dir:
+            self._start_flusher()
+        return response
+
+    def _log_slow_request(self, endpoint: str, elapsed: float, stats: _RequestStats) -> None:
+        lines = [
+            f"Slow request: {request.method} {request.full_path.rstrip('?')} ({endpoint}) took {elapsed * 1000:.1f} ms; "
+            f"{stats.queries} SQL statements in {stats.query_seconds * 1000:.1f} ms, "
+            f"templates {stats.template_seconds * 1000:.1f} ms, notifier {stats.notifier_seconds * 1000:.1f} ms"
+        ]
+        lines += [f"  [{seconds * 1000:7.2f} ms] {' '.join(statement.split())}" for seconds, statement in stats.statements or []]
+        if stats.queries > len(stats.statements or []):
+            lines.append(f"  ... {stats.queries - len(stats.statements or [])} more statements")
+        self._logger.warning("\n".join(lines))
+
+    def _start_flusher(self) -> None:
+        # Once per process, on its first request: a preloaded app is built before the fork
+        if self._snapshot_pid == os.getpid():
+            return
+        with self._flush_lock:
+            if self._snapshot_pid == os.getpid():
+                return
+            os.makedirs(self.multiprocess_dir, exist_ok=True)
+            self._snapshot_path = os.path.join(self.multiprocess_dir, f"{os.getpid()}-{time.time_ns()}.json")
+            self._snapshot_pid = os.getpid()
+        threading.Thread(target=self._flush_forever, name="metrics-flush", daemon=True).start()
+
+    def _flush_forever(self) -> None:
+        while True:
+            time.sleep(self.flush_seconds)
+            try:
+                self._flush()
+            except OSError:
+                self._logger.exception("Could not write metrics snapshot")
+
+    def _flush(self) -> None:
+        data = {collector.name: collector.snapshot() for collector in self._collectors}
+        with self._flush_lock:
+            tmp_path = self._snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(data, fh)
+            os.replace(tmp_path, self._snapshot_path)  # readers never see a half-written file
+
+    def _collect(self) -> List:
+        if not self.multiprocess_dir:
+            return self._collectors
+        self._start_flusher()
+        self._flush()
+        merged = [collector.empty() for collector in self._collectors]
+        for path in glob.glob(os.path.join(self.multiprocess_dir, "*.json")):
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    data = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            for collector in merged:
+                collector.merge(data.get(collector.name, []))
+        return merged
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for collector in self._collect():
+            lines += collector.render()
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+
+from database import db
+from grading import upgrade_answer_keys as _upgrade_answer_keys
+from search import create_index as _create_search_index
+
+
+# db.create_all() only creates missing tables, so anything added to existing
+# tables (indexes, columns) is applied here, in order, exactly once per database.
+# Migrations must be idempotent: a fresh database already has the current schema.
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _create_declared_indexes(conn) -> None:
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _add_quiz_version(conn) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("quizzes")}
+    if "version" not in columns:
+        conn.execute(text("ALTER TABLE quizzes ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+def _add_job_owner(conn) -> None:
+    columns = {column["name"] for column in inspect(conn).get_columns("jobs")}
+    if "owner" not in columns:
+        conn.execute(text("ALTER TABLE jobs ADD COLUMN owner VARCHAR(100)"))
+
+
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "indexes for dashboard, results and grading queries", _create_declared_indexes),
+    (2, "answer key version on quizzes", _add_quiz_version),
+    (3, "full-text search index over lessons, announcements and questions", _create_search_index),
+    (4, "answer keys stored as JSON lists", _upgrade_answer_keys),
+    (5, "owning process on jobs", _add_job_owner),
+]
+
+
+def upgrade(engine) -> List[int]:
+    _metadata.create_all(engine)
+    applied = []
+    with engine.begin() as conn:
+        done = set(conn.execute(select(schema_migrations.c.version)).scalars())
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name, applied_at=datetime.utcnow()))
+        applied.append(version)
+    return applied
+
+
+def current_version(engine) -> int:
+    if not inspect(engine).has_table("schema_migrations"):
+        return 0
+    with engine.connect() as conn:
+        versions = conn.execute(select(schema_migrations.c.version)).scalars().all()
+    return max(versions, default=0)
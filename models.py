@@ -1,4 +1,6 @@
 from datetime import datetime
+from functools import lru_cache
+from typing import Optional
 
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -21,15 +23,27 @@ class User(db.Model, UserMixin):
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+    def set_password(self, password: str, method: Optional[str] = None) -> None:
+        self.password_hash = generate_password_hash(password, method) if method else generate_password_hash(password)
 
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
 
+    def needs_rehash(self, method: str) -> bool:
+        # True when the stored hash was made with a different method or cost
+        return self.password_hash.split("$", 1)[0] != _hash_prefix(method)
+
+
+@lru_cache(maxsize=8)
+def _hash_prefix(method: str) -> str:
+    # Werkzeug fills in default parameters ("pbkdf2" -> "pbkdf2:sha256:600000"),
+    # so the stored form of a method is learned from one throwaway hash
+    return generate_password_hash("", method).split("$", 1)[0]
+
 
 class Lesson(db.Model):
     __tablename__ = "lessons"
+    __table_args__ = (db.Index("ix_lessons_created_at", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -42,6 +56,7 @@ class Lesson(db.Model):
 
 class Announcement(db.Model):
     __tablename__ = "announcements"
+    __table_args__ = (db.Index("ix_announcements_created_at", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -53,6 +68,10 @@ class Announcement(db.Model):
 
 class Quiz(db.Model):
     __tablename__ = "quizzes"
+    __table_args__ = (
+        db.Index("ix_quizzes_created_by_created_at", "created_by_id", "created_at"),  # teacher dashboard / manage
+        db.Index("ix_quizzes_active_created_at", "is_active", "created_at"),  # student dashboard
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -61,10 +80,13 @@ class Quiz(db.Model):
     created_by = db.relationship("User", backref=db.backref("quizzes", lazy=True))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    # Bumped whenever the answer key changes; compiled keys are cached per version (see grading.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
 
 
 class QuizQuestion(db.Model):
     __tablename__ = "quiz_questions"
+    __table_args__ = (db.Index("ix_quiz_questions_quiz_id", "quiz_id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey("quizzes.id"), nullable=False)
@@ -73,12 +95,16 @@ class QuizQuestion(db.Model):
     question_text = db.Column(db.Text, nullable=False)
     question_type = db.Column(db.String(20), nullable=False)  # 'mcq', 'text', 'file'
     options_json = db.Column(db.Text)  # JSON string for MCQ options
-    correct_answer = db.Column(db.Text)  # For MCQ only
+    correct_answer = db.Column(db.Text)  # For MCQ only; JSON list of the accepted options
     points = db.Column(db.Integer, default=1)
 
 
 class QuizSubmission(db.Model):
     __tablename__ = "quiz_submissions"
+    __table_args__ = (
+        db.Index("ix_quiz_submissions_quiz_submitted", "quiz_id", "submitted_at", "id"),  # results paging
+        db.Index("ix_quiz_submissions_student_quiz", "student_id", "quiz_id", "submitted_at"),  # student results
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     quiz_id = db.Column(db.Integer, db.ForeignKey("quizzes.id"), nullable=False)
@@ -94,6 +120,10 @@ class QuizSubmission(db.Model):
 
 class QuizAnswer(db.Model):
     __tablename__ = "quiz_answers"
+    __table_args__ = (
+        db.Index("ix_quiz_answers_submission_id", "submission_id"),
+        db.Index("ix_quiz_answers_question_id", "question_id"),  # per-question stats
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     submission_id = db.Column(db.Integer, db.ForeignKey("quiz_submissions.id"), nullable=False)
@@ -109,4 +139,82 @@ class QuizAnswer(db.Model):
     file_path = db.Column(db.String(500))
 
     is_correct = db.Column(db.Boolean)
-    score = db.Column(db.Integer)
\ No newline at end of file
+    score = db.Column(db.Integer)
+
+
+class NotificationOutbox(db.Model):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (db.Index("ix_notification_outbox_status_next", "status", "next_attempt_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)  # 'email' or 'whatsapp'
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255))  # Email only
+    body = db.Column(db.Text, nullable=False)
+
+    status = db.Column(db.String(20), nullable=False, default="pending")  # 'pending', 'sending', 'sent', 'failed'
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+
+# Precomputed per-quiz statistics, maintained incrementally on submit and grade (see stats.py)
+class QuizStats(db.Model):
+    __tablename__ = "quiz_stats"
+
+    quiz_id = db.Column(db.Integer, db.ForeignKey("quizzes.id"), primary_key=True)
+    submission_count = db.Column(db.Integer, nullable=False, default=0)
+    graded_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Integer, nullable=False, default=0)
+
+
+class QuizScoreBucket(db.Model):
+    __tablename__ = "quiz_score_buckets"
+
+    # Number of graded submissions of a quiz with a given total score
+    quiz_id = db.Column(db.Integer, db.ForeignKey("quizzes.id"), primary_key=True)
+    score = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class QuestionStats(db.Model):
+    __tablename__ = "question_stats"
+
+    question_id = db.Column(db.Integer, db.ForeignKey("quiz_questions.id"), primary_key=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey("quizzes.id"), nullable=False, index=True)
+    answered_count = db.Column(db.Integer, nullable=False, default=0)  # MCQ answers only
+    correct_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Blob(db.Model):
+    __tablename__ = "blobs"
+
+    # Content-addressed upload (see storage.py); refcount = rows referencing it
+    digest = db.Column(db.String(64), primary_key=True)  # sha256 hex
+    size = db.Column(db.Integer, nullable=False)
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+    __table_args__ = (db.Index("ix_jobs_status_created_at", "status", "created_at"),)
+
+    # Long-running teacher operation executed by the job runner (see jobs.py)
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # 'reset', 'grade_all', 'regrade', 'export'
+    params_json = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default="queued")  # 'queued', 'running', 'succeeded', 'failed'
+    progress = db.Column(db.Integer, nullable=False, default=0)  # percent
+    message = db.Column(db.String(255))
+    result_json = db.Column(db.Text)
+    error = db.Column(db.Text)
+    created_by_id = db.Column(db.Integer)  # no FK: a reset recreates the users table underneath running jobs
+    owner = db.Column(db.String(100))  # 'host:pid' of the web process (queued) or pool worker (running)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
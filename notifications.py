@@ -1,44 +1,224 @@
 import os
+import queue
 import smtplib
+import threading
+import time
 from email.mime.text import MIMEText
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
 
-from twilio.rest import Client
+
+# Errors after which an SMTP session can no longer be trusted and is replaced
+_SMTP_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPHeloError)
+
+# (delivered, error); the error is kept on the outbox row when delivery fails
+SendResult = Tuple[bool, Optional[str]]
+
+
+def _describe(exc: Exception) -> str:
+    return f"{type(exc).__name__}: {exc}"[:500]
+
+
+def _connection_lost(exc: Exception) -> bool:
+    # SMTPException subclasses OSError, but a rejected recipient, sender or
+    # message leaves the session usable; only socket errors and the errors
+    # above mean it has to be replaced
+    if isinstance(exc, _SMTP_CONNECTION_ERRORS):
+        return True
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+class _SMTPPool:
+    # Keeps up to `size` authenticated SMTP sessions alive and hands them out one
+    # caller at a time. Sessions idle for longer than `healthcheck_seconds` are
+    # probed with NOOP before reuse and replaced if the probe fails.
+    def __init__(self, connect, size: int = 1, healthcheck_seconds: float = 30.0) -> None:
+        self._connect = connect
+        self._healthcheck_seconds = healthcheck_seconds
+        self._idle: "queue.LifoQueue[Tuple[smtplib.SMTP, float]]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max(1, size))
+
+    def acquire(self) -> smtplib.SMTP:
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    server, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - last_used < self._healthcheck_seconds or self._is_alive(server):
+                    return server
+                self._quietly_close(server)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, server: smtplib.SMTP, broken: bool = False) -> None:
+        if broken:
+            self._quietly_close(server)
+        else:
+            self._idle.put((server, time.monotonic()))
+        self._slots.release()
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._quietly_close(server)
+
+    @staticmethod
+    def _is_alive(server: smtplib.SMTP) -> bool:
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quietly_close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
 
 
 class Notifier:
-    def __init__(self, config) -> None:
+    def __init__(self, config, twilio_client=None) -> None:
         self.config = config
+        # Optional pre-built Twilio client (e.g. a stub in tests)
+        self._twilio_client = twilio_client
+        self._twilio_lock = threading.Lock()
+        self._smtp_pool = _SMTPPool(
+            self._open_smtp,
+            size=int(self._setting("MAIL_POOL_SIZE", 1)),
+            healthcheck_seconds=float(self._setting("MAIL_HEALTHCHECK_SECONDS", 30)),
+        )
 
-    def send_email(self, to_email: str, subject: str, body: str) -> bool:
-        if not to_email or not self.config.MAIL_USERNAME:
-            return False
+    def _setting(self, name: str, default=None):
+        # Works with both Config objects and Flask app.config mappings
+        if isinstance(self.config, dict):
+            return self.config.get(name, default)
+        return getattr(self.config, name, default)
+
+    @property
+    def email_enabled(self) -> bool:
+        return bool(self._setting("MAIL_USERNAME"))
+
+    @property
+    def whatsapp_enabled(self) -> bool:
+        return bool(self._twilio_client or (self._setting("TWILIO_ACCOUNT_SID") and self._setting("TWILIO_AUTH_TOKEN")))
+
+    def _open_smtp(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self._setting("MAIL_SERVER"), self._setting("MAIL_PORT"), timeout=self._setting("MAIL_TIMEOUT", 30))
+        try:
+            if self._setting("MAIL_USE_TLS"):
+                server.starttls()
+            username = self._setting("MAIL_USERNAME")
+            password = self._setting("MAIL_PASSWORD")
+            if username and password:
+                server.login(username, password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _twilio(self):
+        if self._twilio_client is None:
+            with self._twilio_lock:
+                if self._twilio_client is None:
+                    # Imported on first WhatsApp send: twilio (and requests) add ~45 ms
+                    # and several MB to every process that never sends a message
+                    from twilio.rest import Client
+
+                    self._twilio_client = Client(self._setting("TWILIO_ACCOUNT_SID"), self._setting("TWILIO_AUTH_TOKEN"))
+        return self._twilio_client
+
+    def _build_email(self, to_email: str, subject: str, body: str) -> MIMEText:
         msg = MIMEText(body)
         msg["Subject"] = subject
-        msg["From"] = self.config.MAIL_FROM or self.config.MAIL_USERNAME
+        msg["From"] = self._setting("MAIL_FROM") or self._setting("MAIL_USERNAME")
         msg["To"] = to_email
+        return msg
+
+    def send_email(self, to_email: str, subject: str, body: str) -> bool:
+        return self.send_email_many([(to_email, subject, body)])[0][0]
+
+    def send_email_many(self, messages: Iterable[Tuple[str, str, str]]) -> List[SendResult]:
+        # Sends (to_email, subject, body) tuples over pooled sessions; one (ok, error) per message
+        messages = list(messages)
+        if not self.email_enabled:
+            return [(False, "Email is not configured")] * len(messages)
         try:
-            with smtplib.SMTP(self.config.MAIL_SERVER, self.config.MAIL_PORT) as server:
-                if self.config.MAIL_USE_TLS:
-                    server.starttls()
-                if self.config.MAIL_USERNAME and self.config.MAIL_PASSWORD:
-                    server.login(self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD)
-                server.send_message(msg)
-            return True
-        except Exception:
-            return False
+            server = self._smtp_pool.acquire()
+        except Exception as exc:
+            return [(False, _describe(exc))] * len(messages)
+        results: List[SendResult] = [(False, "No recipient")] * len(messages)
+        try:
+            for i, (to_email, subject, body) in enumerate(messages):
+                if not to_email:
+                    continue
+                msg = self._build_email(to_email, subject, body)
+                try:
+                    server.send_message(msg)
+                    results[i] = (True, None)
+                    continue
+                except Exception as exc:
+                    results[i] = (False, _describe(exc))
+                    if not _connection_lost(exc):
+                        continue  # this message was rejected; the session is still fine
+                # Session went away mid-batch: reconnect once and retry this message
+                self._smtp_pool.release(server, broken=True)
+                server = None
+                server = self._smtp_pool.acquire()
+                try:
+                    server.send_message(msg)
+                    results[i] = (True, None)
+                except Exception as exc:
+                    if _connection_lost(exc):
+                        raise
+                    results[i] = (False, _describe(exc))
+        except Exception as exc:
+            # Reconnecting failed or the new session dropped too: give up on the rest of the batch
+            if server is not None:
+                self._smtp_pool.release(server, broken=True)
+                server = None
+            error = _describe(exc)
+            results[i:] = [(False, error)] * (len(messages) - i)
+        finally:
+            if server is not None:
+                self._smtp_pool.release(server)
+        return results
 
     def send_whatsapp(self, to_number: str, message: str) -> bool:
-        if not to_number or not (self.config.TWILIO_ACCOUNT_SID and self.config.TWILIO_AUTH_TOKEN):
-            return False
+        return self.send_whatsapp_many([(to_number, message)])[0][0]
+
+    def send_whatsapp_many(self, messages: Iterable[Tuple[str, str]]) -> List[SendResult]:
+        # Sends (to_number, message) tuples through the shared Twilio client; one (ok, error) per message
+        messages = list(messages)
+        if not self.whatsapp_enabled:
+            return [(False, "WhatsApp is not configured")] * len(messages)
         try:
-            client = Client(self.config.TWILIO_ACCOUNT_SID, self.config.TWILIO_AUTH_TOKEN)
+            client = self._twilio()
+        except Exception as exc:
+            return [(False, _describe(exc))] * len(messages)
+        results: List[SendResult] = [(False, "No recipient")] * len(messages)
+        for i, (to_number, message) in enumerate(messages):
+            if not to_number:
+                continue
             to_formatted = to_number if to_number.startswith("whatsapp:") else f"whatsapp:{to_number}"
-            client.messages.create(
-                from_=self.config.TWILIO_WHATSAPP_FROM,
-                to=to_formatted,
-                body=message,
-            )
-            return True
-        except Exception:
-            return False
\ No newline at end of file
+            try:
+                client.messages.create(
+                    from_=self._setting("TWILIO_WHATSAPP_FROM"),
+                    to=to_formatted,
+                    body=message,
+                )
+                results[i] = (True, None)
+            except Exception as exc:
+                results[i] = (False, _describe(exc))
+        return results
+
+    def close(self) -> None:
+        self._smtp_pool.close_all()
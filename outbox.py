@@ -0,0 +1,189 @@
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, or_, update
+
+from database import db
+from models import NotificationOutbox
+
+
+# Outbox rows are added to the caller's session so they commit atomically with
+# the change that triggered them; the worker delivers them afterwards.
+def enqueue_email(to_email: str, subject: str, body: str) -> Optional[NotificationOutbox]:
+    if not to_email:
+        return None
+    item = NotificationOutbox(channel="email", recipient=to_email, subject=subject, body=body)
+    db.session.add(item)
+    return item
+
+
+def enqueue_whatsapp(to_number: str, body: str) -> Optional[NotificationOutbox]:
+    if not to_number:
+        return None
+    item = NotificationOutbox(channel="whatsapp", recipient=to_number, body=body)
+    db.session.add(item)
+    return item
+
+
+def enqueue_parent_notification(notifier, parent_email: Optional[str], parent_whatsapp: Optional[str],
+                                subject: str, body: str) -> None:
+    if notifier.email_enabled:
+        enqueue_email(parent_email, subject, body)
+    if notifier.whatsapp_enabled:
+        enqueue_whatsapp(parent_whatsapp, body)
+
+
+# Drains the outbox with a small pool of threads. Delivery is at-least-once: a row
+# is claimed by moving it to 'sending', and a claim not resolved within the lease
+# (e.g. the process died) is picked up again. Failed sends are retried with
+# exponential backoff until max_attempts, after which the row is marked 'failed'.
+class OutboxWorker:
+    def __init__(self, app, notifier, workers: int = 2, poll_interval: float = 2.0, batch_size: int = 20,
+                 max_attempts: int = 6, backoff_seconds: float = 30.0, lease_seconds: int = 300) -> None:
+        self.app = app
+        self.notifier = notifier
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.lease_seconds = lease_seconds
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @classmethod
+    def from_config(cls, app, notifier) -> "OutboxWorker":
+        config = app.config
+        return cls(
+            app,
+            notifier,
+            workers=config["OUTBOX_WORKERS"],
+            poll_interval=config["OUTBOX_POLL_INTERVAL"],
+            batch_size=config["OUTBOX_BATCH_SIZE"],
+            max_attempts=config["OUTBOX_MAX_ATTEMPTS"],
+            backoff_seconds=config["OUTBOX_BACKOFF_SECONDS"],
+            lease_seconds=config["OUTBOX_LEASE_SECONDS"],
+        )
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"outbox-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def run_forever(self) -> None:
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def drain(self) -> int:
+        # Synchronously deliver everything that is currently due
+        processed = 0
+        while True:
+            with self.app.app_context():
+                count = self.process_batch()
+            if not count:
+                return processed
+            processed += count
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    count = self.process_batch()
+            except Exception:
+                self.app.logger.exception("Outbox worker iteration failed")
+                count = 0
+            if not count:
+                self._stop.wait(self.poll_interval)
+
+    def process_batch(self) -> int:
+        items = self._claim_batch()
+        if not items:
+            return 0
+        emails = [item for item in items if item.channel == "email"]
+        whatsapps = [item for item in items if item.channel == "whatsapp"]
+        self._deliver(emails, lambda batch: self.notifier.send_email_many(
+            (item.recipient, item.subject or "", item.body) for item in batch))
+        self._deliver(whatsapps, lambda batch: self.notifier.send_whatsapp_many(
+            (item.recipient, item.body) for item in batch))
+        for item in items:
+            if item.channel not in ("email", "whatsapp"):
+                self._finish(item, False, f"Unknown channel '{item.channel}'")
+        db.session.commit()
+        return len(items)
+
+    def _claim_batch(self) -> List[NotificationOutbox]:
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.lease_seconds)
+        candidates = (
+            NotificationOutbox.query.filter(
+                or_(
+                    and_(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now),
+                    and_(NotificationOutbox.status == "sending", NotificationOutbox.locked_at < stale),
+                )
+            )
+            .order_by(NotificationOutbox.next_attempt_at)
+            .limit(self.batch_size)
+            .with_entities(NotificationOutbox.id, NotificationOutbox.status, NotificationOutbox.locked_at)
+            .all()
+        )
+        claimed_ids = []
+        for item_id, status, locked_at in candidates:
+            # Conditional update so concurrent workers never claim the same row
+            result = db.session.execute(
+                update(NotificationOutbox)
+                .where(
+                    NotificationOutbox.id == item_id,
+                    NotificationOutbox.status == status,
+                    NotificationOutbox.locked_at.is_(None) if locked_at is None else NotificationOutbox.locked_at == locked_at,
+                )
+                .values(status="sending", locked_at=now, attempts=NotificationOutbox.attempts + 1)
+            )
+            if result.rowcount == 1:
+                claimed_ids.append(item_id)
+        db.session.commit()
+        if not claimed_ids:
+            return []
+        return NotificationOutbox.query.filter(NotificationOutbox.id.in_(claimed_ids)).all()
+
+    def _deliver(self, items: List[NotificationOutbox], send_many) -> None:
+        if not items:
+            return
+        try:
+            results = send_many(items)
+        except Exception as exc:
+            results = [(False, repr(exc))] * len(items)
+        for item, (ok, error) in zip(items, results):
+            self._finish(item, ok, error)
+
+    def _finish(self, item: NotificationOutbox, ok: bool, error: Optional[str] = None) -> None:
+        if ok:
+            item.status = "sent"
+            item.sent_at = datetime.utcnow()
+            item.last_error = None
+        else:
+            item.last_error = error or "Delivery failed"
+            if item.attempts >= self.max_attempts:
+                item.status = "failed"
+            else:
+                delay = self.backoff_seconds * (2 ** (item.attempts - 1))
+                item.status = "pending"
+                item.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+        item.locked_at = None
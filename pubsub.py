@@ -0,0 +1,143 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+# (id, name, data); ids are microsecond timestamps so every process orders them the same way
+Event = Tuple[int, str, Dict[str, Any]]
+
+
+class Subscription:
+    def __init__(self, max_queued: int) -> None:
+        self._queue: "queue.Queue[Optional[Event]]" = queue.Queue(max_queued)
+        self.closed = False
+
+    def put(self, event: Event) -> None:
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # A client this far behind is dropped; it reconnects and replays from history
+            self.closed = True
+
+    def close(self) -> None:
+        self.closed = True
+        try:
+            self._queue.put_nowait(None)  # wake up the waiting stream
+        except queue.Full:
+            pass
+
+    def get(self, timeout: float) -> Optional[Event]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class LocalBroker:
+    # Fans published events out to the subscribers of this process. The last
+    # `history` events are kept so a reconnecting client (Last-Event-ID) gets
+    # what it missed without touching the database.
+    def __init__(self, max_subscribers: int = 50, history: int = 100, max_queued: int = 100) -> None:
+        self.max_subscribers = max_subscribers
+        self.max_queued = max_queued
+        self._history: Deque[Event] = deque(maxlen=history)
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._last_id = 0
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._last_id = max(self._last_id + 1, time.time_ns() // 1000)
+            return self._last_id
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Optional[Subscription]:
+        # None when this process already serves max_subscribers streams
+        subscription = Subscription(self.max_queued)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            if last_event_id is not None:
+                for event in self._history:
+                    if event[0] > last_event_id:
+                        subscription.put(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, name: str, data: Dict[str, Any]) -> int:
+        event = (self._next_id(), name, data)
+        self._deliver(event)
+        return event[0]
+
+    def _deliver(self, event: Event) -> None:
+        with self._lock:
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def close(self) -> None:
+        # Ends every open stream, e.g. before a worker process exits
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.close()
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+class RedisBroker(LocalBroker):
+    # Publishes through a Redis channel so subscribers in every worker process
+    # see every event. One listener thread per process (started with the first
+    # subscriber, so after any fork) feeds the local fan-out.
+    def __init__(self, url: str, channel: str = "elearning:events", **kwargs) -> None:
+        super().__init__(**kwargs)
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("PUBSUB_BACKEND=redis requires the 'redis' package") from exc
+        self._client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._listener: Optional[threading.Thread] = None
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Optional[Subscription]:
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name="pubsub-listener", daemon=True)
+                self._listener.start()
+        return super().subscribe(last_event_id)
+
+    def publish(self, name: str, data: Dict[str, Any]) -> int:
+        event_id = self._next_id()
+        self._client.publish(self.channel, json.dumps([event_id, name, data]))
+        return event_id
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    event_id, name, data = json.loads(message["data"])
+                    self._deliver((event_id, name, data))
+            except Exception:
+                time.sleep(1)  # Redis restarting; clients replay missed events on reconnect
+
+
+def format_event(event: Event) -> str:
+    event_id, name, data = event
+    return f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def create_broker(config) -> LocalBroker:
+    kwargs = {"max_subscribers": config.get("SSE_MAX_CLIENTS", 50)}
+    if config.get("PUBSUB_BACKEND") == "redis":
+        return RedisBroker(config["PUBSUB_REDIS_URL"], **kwargs)
+    return LocalBroker(**kwargs)
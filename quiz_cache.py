@@ -0,0 +1,89 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from database import db
+from grading import AnswerKey
+from models import Quiz
+
+
+def parse_options(options_json: Optional[str]) -> Tuple[str, ...]:
+    try:
+        options = json.loads(options_json) if options_json else []
+    except ValueError:
+        return ()
+    return tuple(str(option) for option in options) if isinstance(options, list) else ()
+
+
+class CompiledQuestion:
+    __slots__ = ("id", "question_text", "question_type", "points", "options")
+
+    def __init__(self, id: int, question_text: str, question_type: str, points: int, options: Tuple[str, ...]) -> None:
+        self.id = id
+        self.question_text = question_text
+        self.question_type = question_type
+        self.points = points
+        self.options = options
+
+
+class CompiledQuiz:
+    # Read-only snapshot of a quiz as served to students: questions with their
+    # options already decoded plus the compiled answer key. Shared between
+    # requests, so nothing may mutate it after construction.
+    __slots__ = ("id", "title", "description", "version", "created_at", "questions", "answer_key")
+
+    def __init__(self, quiz: Quiz) -> None:
+        self.id = quiz.id
+        self.title = quiz.title
+        self.description = quiz.description
+        self.version = quiz.version or 1
+        self.created_at = quiz.created_at
+        self.questions = tuple(
+            CompiledQuestion(q.id, q.question_text, q.question_type, q.points or 0, parse_options(q.options_json))
+            for q in quiz.questions
+        )
+        self.answer_key = AnswerKey.compile(quiz.id, self.version, quiz.questions)
+
+
+class QuizCache:
+    # Per-process LRU of compiled quizzes. Each lookup checks Quiz.version with
+    # a primary-key read, so an answer-key edit made by another process is
+    # picked up on the next request; invalidate() just frees the entry early.
+    # created_at is compared too: after a reset ids and versions start again at
+    # 1, and only the creation time tells the new quiz from the cached one.
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._quizzes: "OrderedDict[int, CompiledQuiz]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, quiz_id: int) -> Optional[CompiledQuiz]:
+        row = db.session.execute(select(Quiz.version, Quiz.created_at).where(Quiz.id == quiz_id)).first()
+        if row is None:
+            return None
+        with self._lock:
+            compiled = self._quizzes.get(quiz_id)
+            if compiled is not None and (compiled.version, compiled.created_at) == ((row.version or 1), row.created_at):
+                self._quizzes.move_to_end(quiz_id)
+                return compiled
+        quiz = db.session.scalar(select(Quiz).where(Quiz.id == quiz_id).options(selectinload(Quiz.questions)))
+        if quiz is None:
+            return None
+        compiled = CompiledQuiz(quiz)
+        with self._lock:
+            self._quizzes[quiz_id] = compiled
+            self._quizzes.move_to_end(quiz_id)
+            while len(self._quizzes) > self.max_entries:
+                self._quizzes.popitem(last=False)
+        return compiled
+
+    def invalidate(self, quiz_id: int) -> None:
+        with self._lock:
+            self._quizzes.pop(quiz_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._quizzes.clear()
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+
+class LocalBuckets:
+    # Token buckets in process memory. Least recently used buckets are dropped
+    # past max_keys, which at worst hands an idle client a full bucket again.
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        # Returns 0 when a token was taken, otherwise seconds until one is available
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * refill_per_second)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / refill_per_second
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+_REDIS_TAKE = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    # Shared buckets so limits hold across worker processes and hosts. The
+    # refill/take runs as one Lua script, so concurrent logins cannot race.
+    def __init__(self, url: str, prefix: str = "elearning:ratelimit:") -> None:
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("RATELIMIT_BACKEND=redis requires the 'redis' package") from exc
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(_REDIS_TAKE)
+        self.prefix = prefix
+
+    def take(self, key: str, capacity: float, refill_per_second: float) -> float:
+        return float(self._take(keys=[self.prefix + key], args=[capacity, refill_per_second, time.time()]))
+
+    def clear(self) -> None:
+        keys = list(self._client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self._client.delete(*keys)
+
+
+class RateLimiter:
+    def __init__(self, backend, rules: Dict[str, Tuple[float, float]], enabled: bool = True) -> None:
+        # rules: scope -> (burst capacity, tokens refilled per second)
+        self.backend = backend
+        self.rules = rules
+        self.enabled = enabled
+
+    def hit(self, scope: str, identity: str) -> float:
+        if not self.enabled:
+            return 0.0
+        capacity, refill_per_second = self.rules[scope]
+        return self.backend.take(f"{scope}:{identity}", capacity, refill_per_second)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+def create_rate_limiter(config) -> RateLimiter:
+    if config.get("RATELIMIT_BACKEND") == "redis":
+        backend = RedisBuckets(config["RATELIMIT_REDIS_URL"])
+    else:
+        backend = LocalBuckets()
+    rules = {
+        "login-ip": (config["LOGIN_IP_CAPACITY"], config["LOGIN_IP_REFILL_PER_SEC"]),
+        "login-account": (config["LOGIN_ACCOUNT_CAPACITY"], config["LOGIN_ACCOUNT_REFILL_PER_SEC"]),
+    }
+    return RateLimiter(backend, rules, enabled=config.get("RATELIMIT_ENABLED", True))
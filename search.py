@@ -0,0 +1,175 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from markupsafe import Markup, escape
+from sqlalchemy import and_, bindparam, case, literal, or_, select, text, union_all
+
+from database import db
+from models import Announcement, Lesson, Quiz, QuizQuestion
+
+
+# Full-text index over lessons, announcements and quiz questions. On SQLite
+# builds with FTS5 (nearly all) it is a virtual table created by migration 3,
+# written in the same transaction as the rows it mirrors and ranked with bm25.
+# Elsewhere search falls back to LIKE over the source tables.
+TABLE = "search_index"
+_HIGHLIGHT_START, _HIGHLIGHT_END = "\x02", "\x03"
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+CREATE_TABLE = text(
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, quiz_id UNINDEXED, title, body, "
+    "tokenize = 'unicode61 remove_diacritics 2')"
+)
+_INSERT = text(
+    f"INSERT INTO {TABLE} (kind, ref_id, quiz_id, title, body) VALUES (:kind, :ref_id, :quiz_id, :title, :body)"
+)
+_DELETE = text(f"DELETE FROM {TABLE} WHERE kind = :kind AND ref_id IN :ids").bindparams(
+    bindparam("ids", expanding=True)
+)
+_REBUILD = [
+    text(f"DELETE FROM {TABLE}"),
+    text(f"INSERT INTO {TABLE} (kind, ref_id, quiz_id, title, body) "
+         "SELECT 'lesson', id, NULL, title, coalesce(description, '') FROM lessons"),
+    text(f"INSERT INTO {TABLE} (kind, ref_id, quiz_id, title, body) "
+         "SELECT 'announcement', id, NULL, title, content FROM announcements"),
+    text(f"INSERT INTO {TABLE} (kind, ref_id, quiz_id, title, body) "
+         "SELECT 'question', q.id, q.quiz_id, z.title, q.question_text "
+         "FROM quiz_questions q JOIN quizzes z ON z.id = q.quiz_id"),
+]
+_ADD_QUIZ = text(
+    f"INSERT INTO {TABLE} (kind, ref_id, quiz_id, title, body) "
+    "SELECT 'question', q.id, q.quiz_id, z.title, q.question_text "
+    "FROM quiz_questions q JOIN quizzes z ON z.id = q.quiz_id WHERE q.quiz_id = :quiz_id"
+)
+# Title matches weigh ten times body matches; the unindexed columns get 0
+_SEARCH = (
+    f"SELECT kind, ref_id, quiz_id, title, "
+    f"snippet({TABLE}, 4, '{_HIGHLIGHT_START}', '{_HIGHLIGHT_END}', '…', 16) "
+    f"FROM {TABLE} WHERE {TABLE} MATCH :query{{visibility}} "
+    f"ORDER BY bm25({TABLE}, 0, 0, 0, 10.0, 1.0) LIMIT :limit OFFSET :offset"
+)
+_STUDENT_VISIBILITY = " AND (kind != 'question' OR quiz_id IN (SELECT id FROM quizzes WHERE is_active = 1))"
+
+
+def fts5_available(conn) -> bool:
+    if conn.dialect.name != "sqlite":
+        return False
+    return bool(conn.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar())
+
+
+def create_index(conn) -> None:
+    # Migration 3: create and fill the index; databases without FTS5 use the LIKE fallback
+    if fts5_available(conn):
+        conn.execute(CREATE_TABLE)
+        rebuild_index(conn)
+
+
+def rebuild_index(conn) -> None:
+    for statement in _REBUILD:
+        conn.execute(statement)
+
+
+def match_query(raw: str) -> str:
+    # User input as FTS5 syntax: every word must appear, the last one as a prefix
+    words = _WORD.findall(raw)
+    terms = [f'"{word}"' for word in words]
+    if terms:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _highlight(snippet: str) -> Markup:
+    return Markup(
+        str(escape(snippet)).replace(_HIGHLIGHT_START, "<mark>").replace(_HIGHLIGHT_END, "</mark>")
+    )
+
+
+class SearchIndex:
+    def __init__(self, page_size: int = 20) -> None:
+        self.page_size = page_size
+        self._fts: Optional[bool] = None
+
+    def uses_fts(self) -> bool:
+        # Checked once per process: the index exists once `flask init` has run
+        if self._fts is None:
+            self._fts = bool(db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": TABLE}
+            ).first()) if db.engine.dialect.name == "sqlite" else False
+        return self._fts
+
+    def add(self, kind: str, rows: Iterable[Dict]) -> None:
+        # rows: dicts with ref_id, title, body and (questions) quiz_id; written in the caller's transaction
+        if not self.uses_fts():
+            return
+        params = [
+            {"kind": kind, "ref_id": row["ref_id"], "quiz_id": row.get("quiz_id"),
+             "title": row["title"] or "", "body": row["body"] or ""}
+            for row in rows
+        ]
+        if params:
+            db.session.execute(_INSERT, params)
+
+    def add_quiz(self, quiz_id: int) -> None:
+        # Questions are bulk-inserted without returning ids, so they are copied over in SQL
+        if self.uses_fts():
+            db.session.execute(_ADD_QUIZ, {"quiz_id": quiz_id})
+
+    def remove(self, kind: str, ref_ids: Iterable[int]) -> None:
+        if not self.uses_fts():
+            return
+        ids = list(ref_ids)
+        if ids:
+            db.session.execute(_DELETE, {"kind": kind, "ids": ids})
+
+    def rebuild(self) -> None:
+        if self.uses_fts():
+            rebuild_index(db.session.connection())
+
+    def search(self, raw: str, page: int = 1, include_inactive: bool = False) -> Tuple[List[Dict], bool]:
+        # Returns (results, has_next); one extra row is fetched instead of counting
+        query = match_query(raw)
+        if not query:
+            return [], False
+        offset = (max(page, 1) - 1) * self.page_size
+        if self.uses_fts():
+            sql = _SEARCH.format(visibility="" if include_inactive else _STUDENT_VISIBILITY)
+            rows = db.session.execute(
+                text(sql), {"query": query, "limit": self.page_size + 1, "offset": offset}
+            ).all()
+            results = [
+                {"kind": kind, "id": ref_id, "quiz_id": quiz_id, "title": title, "snippet": _highlight(snippet)}
+                for kind, ref_id, quiz_id, title, snippet in rows
+            ]
+        else:
+            results = self._search_like(_WORD.findall(raw), offset, include_inactive)
+        return results[:self.page_size], len(results) > self.page_size
+
+    def _search_like(self, words: List[str], offset: int, include_inactive: bool) -> List[Dict]:
+        # Unindexed fallback: every word in the title or body, title matches first
+        def source(kind, ref_id, quiz_id, title, body, *where):
+            in_title = and_(*(title.ilike(f"%{word}%") for word in words))
+            matches = and_(*(or_(title.ilike(f"%{word}%"), body.ilike(f"%{word}%")) for word in words))
+            return select(
+                literal(kind).label("kind"), ref_id.label("ref_id"), quiz_id.label("quiz_id"),
+                title.label("title"), body.label("body"), case((in_title, 0), else_=1).label("weight"),
+            ).where(matches, *where)
+
+        questions = source(
+            "question", QuizQuestion.id, QuizQuestion.quiz_id, Quiz.title, QuizQuestion.question_text,
+            *(() if include_inactive else (Quiz.is_active.is_(True),)),
+        ).join_from(QuizQuestion, Quiz, QuizQuestion.quiz_id == Quiz.id)
+        combined = union_all(
+            source("lesson", Lesson.id, literal(None), Lesson.title, Lesson.description),
+            source("announcement", Announcement.id, literal(None), Announcement.title, Announcement.content),
+            questions,
+        ).subquery()
+        rows = db.session.execute(
+            select(combined).order_by(combined.c.weight, combined.c.kind, combined.c.ref_id.desc())
+            .limit(self.page_size + 1).offset(offset)
+        ).all()
+        return [
+            {"kind": row.kind, "id": row.ref_id, "quiz_id": row.quiz_id, "title": row.title,
+             "snippet": escape((row.body or "")[:200])}
+            for row in rows
+        ]
@@ -0,0 +1,228 @@
+"""Production entry point: one-time setup and a pre-fork multi-worker server.
+
+    python serve.py init
+    python serve.py serve [--bind 0.0.0.0:8000] [--workers 4] [--threads 4] [--preload] [--server auto]
+
+Serves with gunicorn (gthread workers) when it is installed, otherwise with a
+small built-in pre-fork server on top of Werkzeug. Every worker process
+handles up to --threads requests at once, plus up to SSE_MAX_CLIENTS open
+/events streams on threads of their own. SQLite takes one writer at a time,
+so extra processes mostly add CPU for templates and password checks. Threads
+cover time spent waiting on the database. --preload builds the app once
+before forking, which shares imported code between workers and starts them
+faster. benchmarks/startup.py measures both modes.
+"""
+import argparse
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Flask
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from app import create_app, init_db, start_background_workers
+from config import Config
+from database import db
+
+
+def _parse_bind(bind: str) -> Tuple[str, int]:
+    host, _, port = bind.rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+def _worker_app(overrides: Dict) -> Flask:
+    app = create_app(overrides)
+    start_background_workers(app)
+    return app
+
+
+def _after_fork(app: Flask) -> None:
+    # Connections opened while preloading belong to the parent process. Outbox
+    # threads must not exist at fork time, so each worker starts its own here.
+    with app.app_context():
+        db.engine.dispose(close=False)
+    start_background_workers(app)
+
+
+class _RequestHandler(WSGIRequestHandler):
+    # One request per connection, so idle keep-alive clients never hold a pool thread
+    protocol_version = "HTTP/1.0"
+
+
+class _PooledWSGIServer(BaseWSGIServer):
+    # Werkzeug's server with requests handled by a fixed-size thread pool
+    multithread = True
+
+    def __init__(self, host: str, port: int, app: Flask, threads: int, fd: int) -> None:
+        super().__init__(host, port, app, handler=_RequestHandler, fd=fd)
+        self.pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+
+    def process_request(self, request, client_address) -> None:
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def _serve_worker(app: Optional[Flask], sock: socket.socket, host: str, threads: int, overrides: Dict) -> None:
+    def stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    if app is None:
+        app = _worker_app(overrides)
+    else:
+        _after_fork(app)
+    server = _PooledWSGIServer(host, sock.getsockname()[1], app, threads, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    except SystemExit:
+        pass
+    finally:
+        # Finish in-flight requests and jobs before the process goes away
+        server.server_close()
+        app.extensions["broker"].close()
+        server.pool.shutdown(wait=True)
+        app.extensions["outbox_worker"].stop(timeout=5)
+        app.extensions["job_runner"].shutdown()
+
+
+def run_builtin(bind: str, workers: int, threads: int, preload: bool, overrides: Dict) -> None:
+    host, port = _parse_bind(bind)
+    sock = socket.create_server((host, port), backlog=2048)
+    app = create_app(overrides) if preload else None
+    children: Dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _serve_worker(app, sock, host, threads, overrides)
+            except BaseException:
+                code = 1
+                import traceback
+
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(workers):
+        spawn()
+    print(f"Listening on http://{host}:{sock.getsockname()[1]} with {workers} worker(s) x {threads} thread(s)"
+          f"{' (preloaded)' if preload else ''}; master pid {os.getpid()}", flush=True)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}; restarting", flush=True)
+        if time.monotonic() - started < 1:
+            time.sleep(1)  # a worker that dies on startup should not spin the master
+        spawn()
+    sock.close()
+
+
+def run_gunicorn(bind: str, workers: int, threads: int, preload: bool, overrides: Dict) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    factory: Callable[[], Flask] = (lambda: create_app(overrides)) if preload else (lambda: _worker_app(overrides))
+    loaded: Dict[str, Flask] = {}
+
+    def post_fork(server, worker) -> None:
+        if preload:
+            _after_fork(loaded["app"])
+
+    class Application(BaseApplication):
+        def load_config(self) -> None:
+            self.cfg.set("bind", bind)
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("preload_app", preload)
+            self.cfg.set("post_fork", post_fork)
+
+        def load(self) -> Flask:
+            loaded["app"] = factory()
+            return loaded["app"]
+
+    Application().run()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("init", help="create folders and tables, apply migrations")
+    serve = commands.add_parser("serve", help="run the pre-fork server")
+    serve.add_argument("--bind", default=os.environ.get("BIND", "0.0.0.0:8000"))
+    serve.add_argument("--workers", type=int, default=int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1)))
+    serve.add_argument("--threads", type=int, default=int(os.environ.get("WEB_THREADS", 4)))
+    serve.add_argument("--preload", action="store_true", default=os.environ.get("WEB_PRELOAD", "").lower() == "true")
+    serve.add_argument("--server", choices=["auto", "gunicorn", "builtin"], default=os.environ.get("WEB_SERVER", "auto"))
+    args = parser.parse_args()
+
+    if args.command == "init":
+        applied = init_db(create_app())
+        print(f"Initialized. Applied migrations: {applied or 'none'}.")
+        return
+
+    # Open /events streams each hold a thread for minutes; reserve them their own
+    # so they never starve ordinary requests (pool threads only start when used)
+    threads = args.threads + Config.SSE_MAX_CLIENTS
+    server = args.server
+    if server == "auto":
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn"
+        except ImportError:
+            server = "builtin"
+    overrides: Dict = {}
+    metrics_dir = None
+    if args.workers > 1 and Config.METRICS_ENABLED and not Config.METRICS_MULTIPROC_DIR:
+        # Workers pool their /metrics counters here; a fresh directory per run
+        # keeps totals from earlier runs out
+        metrics_dir = tempfile.mkdtemp(prefix="elearning-metrics-")
+        overrides["METRICS_MULTIPROC_DIR"] = metrics_dir
+    master_pid = os.getpid()
+    try:
+        if server == "gunicorn":
+            run_gunicorn(args.bind, args.workers, threads, args.preload, overrides)
+        else:
+            run_builtin(args.bind, args.workers, threads, args.preload, overrides)
+    finally:
+        # Gunicorn workers leave through here too; only the master cleans up
+        if metrics_dir and os.getpid() == master_pid:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
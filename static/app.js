@@ -1 +1,62 @@
-// Basic client helpers can go here.
\ No newline at end of file
+// Live updates: pages with [data-live] lists subscribe to /events (server-sent
+// events) and patch the lists in place instead of reloading.
+(function () {
+	var url = document.body.dataset.eventsUrl;
+	var lists = document.querySelectorAll('[data-live]');
+	if (!url || !lists.length || !window.EventSource) {
+		return;
+	}
+
+	function listsFor(kind) {
+		return document.querySelectorAll('[data-live="' + kind + '"]');
+	}
+
+	function item(title, rest) {
+		var li = document.createElement('li');
+		var strong = document.createElement('strong');
+		strong.textContent = title;
+		li.appendChild(strong);
+		li.appendChild(document.createTextNode(' — '));
+		if (typeof rest === 'string') {
+			li.appendChild(document.createTextNode(rest));
+		} else {
+			li.appendChild(rest);
+		}
+		return li;
+	}
+
+	function prepend(list, li) {
+		var empty = list.querySelector('li.empty');
+		if (empty) {
+			empty.remove();
+		}
+		list.insertBefore(li, list.firstChild);
+	}
+
+	var source = new EventSource(url);
+
+	source.addEventListener('announcement', function (e) {
+		var a = JSON.parse(e.data);
+		listsFor('announcement').forEach(function (list) {
+			prepend(list, item(a.title, a.content));
+		});
+	});
+
+	source.addEventListener('quiz', function (e) {
+		var q = JSON.parse(e.data);
+		listsFor('quiz').forEach(function (list) {
+			var existing = list.querySelector('li[data-quiz-id="' + q.id + '"]');
+			if (existing) {
+				existing.remove();
+			}
+			if (q.is_active) {
+				var link = document.createElement('a');
+				link.href = q.url;
+				link.textContent = 'Take quiz';
+				var li = item(q.title, link);
+				li.dataset.quizId = q.id;
+				prepend(list, li);
+			}
+		});
+	});
+})();
@@ -0,0 +1,228 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, case, delete, func, insert, literal, select, update
+
+from database import db
+from models import Quiz, QuizAnswer, QuizQuestion, QuizScoreBucket, QuizStats, QuizSubmission, QuestionStats
+
+
+# All writers below only add deltas with UPDATE ... SET col = col + n so that
+# concurrent submissions never lose each other's counts. If a quiz has no stats
+# row yet (created before stats existed) it is rebuilt from scratch instead.
+
+def init_quiz_stats(quiz_id: int) -> None:
+    # Call once the quiz's questions are inserted; two statements regardless of question count
+    db.session.execute(insert(QuizStats.__table__).values(quiz_id=quiz_id))
+    db.session.execute(
+        insert(QuestionStats.__table__).from_select(
+            ["question_id", "quiz_id", "answered_count", "correct_count"],
+            select(QuizQuestion.id, QuizQuestion.quiz_id, literal(0), literal(0)).where(QuizQuestion.quiz_id == quiz_id),
+        )
+    )
+
+
+def record_submission(quiz_id: int, graded: bool, total_score: Optional[int],
+                      mcq_results: Iterable[Tuple[int, bool]]) -> None:
+    # mcq_results: (question_id, is_correct) for every auto-graded answer
+    db.session.flush()
+    result = db.session.execute(
+        update(QuizStats.__table__)
+        .where(QuizStats.quiz_id == quiz_id)
+        .values(
+            submission_count=QuizStats.submission_count + 1,
+            graded_count=QuizStats.graded_count + (1 if graded else 0),
+            score_sum=QuizStats.score_sum + ((total_score or 0) if graded else 0),
+        )
+    )
+    if result.rowcount == 0:
+        rebuild_quiz_stats(quiz_id)
+        return
+    if graded:
+        _add_to_buckets(quiz_id, {total_score or 0: 1})
+    params = [{"qid": question_id, "correct": 1 if is_correct else 0} for question_id, is_correct in mcq_results]
+    if params:
+        db.session.execute(
+            update(QuestionStats.__table__)
+            .where(QuestionStats.question_id == bindparam("qid"))
+            .values(
+                answered_count=QuestionStats.answered_count + 1,
+                correct_count=QuestionStats.correct_count + bindparam("correct"),
+            ),
+            params,
+        )
+
+
+def record_grade(quiz_id: int, was_graded: bool, old_total: Optional[int], new_total: int) -> None:
+    db.session.flush()
+    if was_graded:
+        values = {"score_sum": QuizStats.score_sum + (new_total - (old_total or 0))}
+    else:
+        values = {"graded_count": QuizStats.graded_count + 1, "score_sum": QuizStats.score_sum + new_total}
+    result = db.session.execute(update(QuizStats.__table__).where(QuizStats.quiz_id == quiz_id).values(**values))
+    if result.rowcount == 0:
+        rebuild_quiz_stats(quiz_id)
+        return
+    changes = {new_total: 1}
+    if was_graded:
+        old_total = old_total or 0
+        changes[old_total] = changes.get(old_total, 0) - 1
+    _add_to_buckets(quiz_id, changes)
+
+
+def record_bulk_grade(quiz_id: int, submission_ids: List[int]) -> None:
+    # For submissions that just went from pending to graded in one statement
+    db.session.flush()
+    rows = db.session.execute(
+        select(QuizSubmission.total_score, func.count())
+        .where(QuizSubmission.id.in_(submission_ids))
+        .group_by(QuizSubmission.total_score)
+    ).all()
+    changes = {total or 0: count for total, count in rows}
+    result = db.session.execute(
+        update(QuizStats.__table__)
+        .where(QuizStats.quiz_id == quiz_id)
+        .values(
+            graded_count=QuizStats.graded_count + sum(changes.values()),
+            score_sum=QuizStats.score_sum + sum(score * count for score, count in changes.items()),
+        )
+    )
+    if result.rowcount == 0:
+        rebuild_quiz_stats(quiz_id)
+        return
+    _add_to_buckets(quiz_id, changes)
+
+
+def _add_to_buckets(quiz_id: int, changes: Dict[int, int]) -> None:
+    for score, delta in changes.items():
+        if not delta:
+            continue
+        result = db.session.execute(
+            update(QuizScoreBucket.__table__)
+            .where(QuizScoreBucket.quiz_id == quiz_id, QuizScoreBucket.score == score)
+            .values(count=QuizScoreBucket.count + delta)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(QuizScoreBucket.__table__).values(quiz_id=quiz_id, score=score, count=delta))
+
+
+def rebuild_quiz_stats(quiz_id: int) -> None:
+    db.session.flush()
+    db.session.execute(delete(QuizStats.__table__).where(QuizStats.quiz_id == quiz_id))
+    db.session.execute(delete(QuizScoreBucket.__table__).where(QuizScoreBucket.quiz_id == quiz_id))
+    db.session.execute(delete(QuestionStats.__table__).where(QuestionStats.quiz_id == quiz_id))
+
+    graded = QuizSubmission.graded.is_(True)
+    submission_count, graded_count, score_sum = db.session.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(case((graded, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((graded, QuizSubmission.total_score), else_=0)), 0),
+        ).where(QuizSubmission.quiz_id == quiz_id)
+    ).one()
+    db.session.execute(
+        insert(QuizStats.__table__).values(
+            quiz_id=quiz_id, submission_count=submission_count, graded_count=graded_count, score_sum=score_sum
+        )
+    )
+
+    buckets = db.session.execute(
+        select(func.coalesce(QuizSubmission.total_score, 0), func.count())
+        .where(QuizSubmission.quiz_id == quiz_id, graded)
+        .group_by(func.coalesce(QuizSubmission.total_score, 0))
+    ).all()
+    if buckets:
+        db.session.execute(
+            insert(QuizScoreBucket.__table__),
+            [{"quiz_id": quiz_id, "score": score, "count": count} for score, count in buckets],
+        )
+
+    answer_counts = {
+        question_id: (answered, correct)
+        for question_id, answered, correct in db.session.execute(
+            select(
+                QuizAnswer.question_id,
+                func.count(),
+                func.coalesce(func.sum(case((QuizAnswer.is_correct.is_(True), 1), else_=0)), 0),
+            )
+            .join(QuizQuestion, QuizAnswer.question_id == QuizQuestion.id)
+            .where(QuizQuestion.quiz_id == quiz_id, QuizQuestion.question_type == "mcq")
+            .group_by(QuizAnswer.question_id)
+        )
+    }
+    question_ids = db.session.scalars(select(QuizQuestion.id).where(QuizQuestion.quiz_id == quiz_id)).all()
+    if question_ids:
+        db.session.execute(
+            insert(QuestionStats.__table__),
+            [
+                {
+                    "question_id": question_id,
+                    "quiz_id": quiz_id,
+                    "answered_count": answer_counts.get(question_id, (0, 0))[0],
+                    "correct_count": answer_counts.get(question_id, (0, 0))[1],
+                }
+                for question_id in question_ids
+            ],
+        )
+
+
+def rebuild_stats(quiz_id: Optional[int] = None) -> int:
+    quiz_ids = [quiz_id] if quiz_id is not None else db.session.scalars(select(Quiz.id)).all()
+    for qid in quiz_ids:
+        rebuild_quiz_stats(qid)
+    db.session.commit()
+    return len(quiz_ids)
+
+
+def _median(buckets: List[Tuple[int, int]]) -> Optional[float]:
+    total = sum(count for _, count in buckets)
+    if not total:
+        return None
+    # Scores at positions total//2 (and total//2 - 1 when even), 0-based
+    wanted = {total // 2} if total % 2 else {total // 2 - 1, total // 2}
+    picked: List[int] = []
+    seen = 0
+    for score, count in buckets:
+        for position in sorted(wanted):
+            if seen <= position < seen + count:
+                picked.append(score)
+        seen += count
+    return sum(picked) / len(picked)
+
+
+def load_quiz_stats(quiz_ids: List[int]) -> Dict[int, dict]:
+    # Summary per quiz in two queries, independent of the number of answers
+    if not quiz_ids:
+        return {}
+    buckets: Dict[int, List[Tuple[int, int]]] = {}
+    for quiz_id, score, count in db.session.execute(
+        select(QuizScoreBucket.quiz_id, QuizScoreBucket.score, QuizScoreBucket.count)
+        .where(QuizScoreBucket.quiz_id.in_(quiz_ids), QuizScoreBucket.count > 0)
+        .order_by(QuizScoreBucket.quiz_id, QuizScoreBucket.score)
+    ):
+        buckets.setdefault(quiz_id, []).append((score, count))
+
+    summaries = {}
+    for row in QuizStats.query.filter(QuizStats.quiz_id.in_(quiz_ids)):
+        distribution = buckets.get(row.quiz_id, [])
+        summaries[row.quiz_id] = {
+            "submissions": row.submission_count,
+            "graded": row.graded_count,
+            "pending": row.submission_count - row.graded_count,
+            "average": round(row.score_sum / row.graded_count, 2) if row.graded_count else None,
+            "median": _median(distribution),
+            "distribution": distribution,
+        }
+    return summaries
+
+
+def load_question_stats(quiz_ids: List[int]) -> Dict[int, dict]:
+    if not quiz_ids:
+        return {}
+    return {
+        row.question_id: {
+            "answered": row.answered_count,
+            "correct": row.correct_count,
+            "correct_rate": round(100.0 * row.correct_count / row.answered_count, 1) if row.answered_count else None,
+        }
+        for row in QuestionStats.query.filter(QuestionStats.quiz_id.in_(quiz_ids))
+    }
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import re
+import time
+import uuid
+from typing import Iterable, List, Optional, Tuple
+
+from flask import Response, request, send_file
+from sqlalchemy import delete, insert, select, update
+from werkzeug.utils import secure_filename
+
+from database import db
+from models import Blob
+
+
+# Uploads are stored once per distinct content under blobs/<aa>/<bb>/<sha256>.
+# The value kept in Lesson.file_path / QuizAnswer.file_path is
+# "blobs/<aa>/<bb>/<sha256>/<download name>", so the original filename survives
+# for downloads while identical files share one copy on disk.
+_KEY_RE = re.compile(r"^blobs/([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})/([^/]+)$")
+
+
+def parse_key(file_path: Optional[str]) -> Optional[Tuple[str, str]]:
+    # Returns (digest, download_name) for blob keys, None for legacy flat filenames
+    match = _KEY_RE.match(file_path or "")
+    if not match or match.group(3)[:2] != match.group(1) or match.group(3)[2:4] != match.group(2):
+        return None
+    return match.group(3), match.group(4)
+
+
+class BlobStore:
+    def __init__(self, upload_folder: str, chunk_size: int = 1024 * 1024) -> None:
+        self.root = os.path.join(upload_folder, "blobs")
+        self.chunk_size = chunk_size
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def save(self, uploaded) -> str:
+        # Writes the blob and adds a reference in the current session (commits with the caller)
+        digest, size, key = self.write(uploaded)
+        self.add_reference(digest, size)
+        return key
+
+    def write(self, uploaded) -> Tuple[str, int, str]:
+        # Stream the upload to a temp file while hashing, then move it into place.
+        # Touches only the filesystem; pair with add_reference() in the transaction.
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as out:
+                while True:
+                    chunk = uploaded.stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            destination = self.path_for(digest)
+            if os.path.exists(destination):
+                os.remove(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                os.replace(tmp_path, destination)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        download_name = secure_filename(uploaded.filename or "") or "file"
+        return digest, size, f"blobs/{digest[:2]}/{digest[2:4]}/{digest}/{download_name}"
+
+    def add_reference(self, digest: str, size: int) -> None:
+        result = db.session.execute(
+            update(Blob.__table__).where(Blob.digest == digest).values(refcount=Blob.refcount + 1)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(Blob.__table__).values(digest=digest, size=size, refcount=1))
+
+    def release(self, file_path: Optional[str]) -> Optional[str]:
+        # Drops one reference; returns the digest if nothing references it any more.
+        # Call remove_unreferenced() with it once the transaction has committed.
+        parsed = parse_key(file_path)
+        if not parsed:
+            return None
+        digest = parsed[0]
+        db.session.execute(update(Blob.__table__).where(Blob.digest == digest).values(refcount=Blob.refcount - 1))
+        refcount = db.session.scalar(select(Blob.refcount).where(Blob.digest == digest))
+        if refcount is not None and refcount <= 0:
+            db.session.execute(delete(Blob.__table__).where(Blob.digest == digest))
+            return digest
+        return None
+
+    def remove_unreferenced(self, digests: Iterable[Optional[str]]) -> None:
+        for digest in digests:
+            if not digest:
+                continue
+            # A concurrent upload of the same content may have re-created the row
+            if db.session.get(Blob, digest) is not None:
+                continue
+            try:
+                os.remove(self.path_for(digest))
+            except FileNotFoundError:
+                pass
+
+    def send(self, digest: str, download_name: str, mode: str = "direct", accel_prefix: str = "/protected-uploads/",
+             max_age: int = 31536000) -> Response:
+        # Blobs never change, so the digest is a strong ETag and clients may cache
+        # them for a long time (privately: downloads require a login).
+        path = self.path_for(digest)
+        if mode in ("x-accel-redirect", "x-sendfile"):
+            # The front-end server streams the bytes and handles Range requests;
+            # Python only answers conditional GETs.
+            rv = Response(mimetype="application/octet-stream")
+            if mode == "x-accel-redirect":
+                rv.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{digest[:2]}/{digest[2:4]}/{digest}"
+            else:
+                rv.headers["X-Sendfile"] = os.path.abspath(path)
+            rv.headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+            rv.set_etag(digest)
+            rv.cache_control.max_age = max_age
+            rv = rv.make_conditional(request, accept_ranges=False)
+        else:
+            # Handles If-None-Match (304) and byte ranges (206) for resumable downloads
+            rv = send_file(path, as_attachment=True, download_name=download_name, etag=digest,
+                           conditional=True, max_age=max_age)
+            rv.headers.setdefault("Accept-Ranges", "bytes")
+        rv.cache_control.public = False
+        rv.cache_control.private = True
+        rv.cache_control.immutable = True
+        return rv
+
+    def collect_orphans(self, min_age_seconds: int = 3600) -> List[str]:
+        # Removes blob files without a row, e.g. left behind by a rolled back upload.
+        # Young files are skipped: their upload may not have committed yet.
+        cutoff = time.time() - min_age_seconds
+        known = set(db.session.scalars(select(Blob.digest)).all())
+        removed = []
+        if not os.path.isdir(self.root):
+            return removed
+        for dirpath, _, filenames in os.walk(self.root):
+            if os.path.basename(dirpath) == "tmp" and os.path.dirname(dirpath) == self.root:
+                continue
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                if re.fullmatch(r"[0-9a-f]{64}", name) and name not in known and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed.append(name)
+        return removed
@@ -0,0 +1,66 @@
+from typing import Optional
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from database import db
+from models import User
+
+
+_FIELDS = ("id", "name", "email", "role", "parent_email", "parent_whatsapp")
+
+
+class CachedUser(UserMixin):
+    # What request handlers read from current_user, without the ORM instance.
+    # Anything that needs to write to the user must load User explicitly.
+    __slots__ = _FIELDS
+
+    def __init__(self, id: int, name: str, email: str, role: str,
+                 parent_email: Optional[str] = None, parent_whatsapp: Optional[str] = None) -> None:
+        self.id = id
+        self.name = name
+        self.email = email
+        self.role = role
+        self.parent_email = parent_email
+        self.parent_whatsapp = parent_whatsapp
+
+
+def _key(user_id) -> str:
+    return f"user:{user_id}"
+
+
+def load_cached_user(cache, user_id: int, ttl: float) -> Optional[CachedUser]:
+    # Stored as a plain dict (or None for unknown ids) so any cache backend can hold it
+    def load():
+        user = db.session.get(User, user_id)
+        return {field: getattr(user, field) for field in _FIELDS} if user else None
+
+    data = cache.get_or_set(_key(user_id), load, ttl=ttl)
+    return CachedUser(**data) if data else None
+
+
+# Changed users are dropped once the change commits, so a concurrent request
+# cannot re-cache the old row between flush and commit. The listeners are
+# global, so they act on the user cache of whichever app is current. Bulk
+# UPDATEs bypass them and must call user_cache.delete(f"user:{id}") themselves.
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_stale(mapper, connection, target):
+    object_session(target).info.setdefault("stale_users", set()).add(target.id)
+
+
+@event.listens_for(db.session, "after_commit")
+def _drop_stale(session):
+    stale = session.info.pop("stale_users", ())
+    cache = current_app.extensions.get("user_cache") if has_app_context() else None
+    if cache is not None:
+        for user_id in stale:
+            cache.delete(_key(user_id))
+
+
+@event.listens_for(db.session, "after_soft_rollback")
+def _forget_stale(session, previous_transaction):
+    session.info.pop("stale_users", None)
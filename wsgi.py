@@ -0,0 +1,8 @@
+# WSGI entry point for external servers, e.g. `gunicorn -w 4 --threads 4 wsgi:app`.
+# Run `python serve.py init` (or `flask init`) once before starting workers.
+# Not for `gunicorn --preload`: outbox threads would start before the fork
+# (`python serve.py serve --preload` handles that).
+from app import create_app, start_background_workers
+
+app = create_app()
+start_background_workers(app)